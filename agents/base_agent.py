@@ -1,33 +1,76 @@
 """Base agent class with Gemini integration."""
 from abc import ABC, abstractmethod
-from typing import Dict, List, Optional, Any
+from typing import Deque, Dict, List, Optional, Any
+from collections import deque
+from dataclasses import dataclass, field
 from datetime import datetime
-import json
+import asyncio
+
+try:
+    import orjson
+    
+    def _dumps(obj: Any) -> str:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+except ImportError:
+    import json
+    
+    def _dumps(obj: Any) -> str:
+        return json.dumps(obj, separators=(',', ':'))
+
+# Prefer the native google-genai async client; the LangChain wrapper's async
+# path regressed badly in langchain-google-genai 4.2.0
+try:
+    from google import genai
+    from google.genai import types as genai_types
+    GENAI_NATIVE_AVAILABLE = True
+except ImportError:
+    GENAI_NATIVE_AVAILABLE = False
 
 try:
     from langchain_google_genai import ChatGoogleGenerativeAI
-    GEMINI_AVAILABLE = True
+    from langchain_core.messages import HumanMessage, SystemMessage
+    LANGCHAIN_GEMINI_AVAILABLE = True
 except ImportError:
-    GEMINI_AVAILABLE = False
+    LANGCHAIN_GEMINI_AVAILABLE = False
+
+GEMINI_AVAILABLE = GENAI_NATIVE_AVAILABLE or LANGCHAIN_GEMINI_AVAILABLE
+AGENT_MODEL = "gemini-2.0-flash-exp"
+SUMMARY_MAX_CHARS = 2000  # Cap on the rolling summary of evicted messages
+SUMMARY_SNIPPET_CHARS = 200  # Per-message share of the rolling summary
 
 from config import settings
 
+# Shared across agents so parallel fan-out can't burst past the API rate limit
+_llm_semaphore: Optional[asyncio.Semaphore] = None
+
 
+def _get_llm_semaphore() -> asyncio.Semaphore:
+    global _llm_semaphore
+    if _llm_semaphore is None:
+        _llm_semaphore = asyncio.Semaphore(max(1, settings.gemini_concurrency))
+    return _llm_semaphore
+
+
+@dataclass(slots=True)
 class AgentMessage:
     """Represents a message from an agent."""
     
-    def __init__(self, role: str, content: str, metadata: Dict = None):
-        self.role = role
-        self.content = content
-        self.metadata = metadata or {}
-        self.timestamp = datetime.now()
+    role: str
+    content: str
+    metadata: Optional[Dict] = None
+    # Formatted once at creation so history dumps don't re-format datetimes
+    timestamp: str = field(default_factory=lambda: datetime.now().isoformat())
+    
+    def __post_init__(self):
+        if self.metadata is None:
+            self.metadata = {}
     
     def to_dict(self) -> Dict:
         return {
             "role": self.role,
             "content": self.content,
             "metadata": self.metadata,
-            "timestamp": self.timestamp.isoformat()
+            "timestamp": self.timestamp
         }
 
 
@@ -38,18 +81,37 @@ class BaseAgent(ABC):
         self.name = name
         self.role = role
         self.system_prompt = system_prompt
-        self.conversation_history: List[AgentMessage] = []
+        self.conversation_history: Deque[AgentMessage] = deque(
+            maxlen=max(1, settings.agent_history_window)
+        )
+        self._summary: str = ""
         self.llm = None
+        self._native = False
+        self._base_messages: List[Any] = []
+        self._genai_config = None
+        
+        # Built once so every turn shares the same stable prefix
+        self._prompt_prefix = f"You are {name}, {role}.\n\n{system_prompt}"
         
         # Initialize LLM if Gemini is available and configured
         if GEMINI_AVAILABLE and settings.gemini_api_key:
             try:
-                self.llm = ChatGoogleGenerativeAI(
-                    model="gemini-2.0-flash-exp",
-                    google_api_key=settings.gemini_api_key,
-                    temperature=0.1,
-                    max_output_tokens=4096
-                )
+                if GENAI_NATIVE_AVAILABLE:
+                    self.llm = genai.Client(api_key=settings.gemini_api_key).aio
+                    self._genai_config = genai_types.GenerateContentConfig(
+                        system_instruction=self._prompt_prefix,
+                        temperature=0.1,
+                        max_output_tokens=4096
+                    )
+                    self._native = True
+                else:
+                    self.llm = ChatGoogleGenerativeAI(
+                        model=AGENT_MODEL,
+                        google_api_key=settings.gemini_api_key,
+                        temperature=0.1,
+                        max_output_tokens=4096
+                    )
+                    self._base_messages = [SystemMessage(content=self._prompt_prefix)]
             except Exception as e:
                 print(f"Warning: Failed to initialize Gemini for {name}: {e}")
         
@@ -60,9 +122,18 @@ class BaseAgent(ABC):
     def add_message(self, role: str, content: str, metadata: Dict = None):
         """Add a message to conversation history."""
         msg = AgentMessage(role, content, metadata)
+        if len(self.conversation_history) == self.conversation_history.maxlen:
+            self._maybe_summarize(self.conversation_history[0])
         self.conversation_history.append(msg)
         return msg
     
+    def _maybe_summarize(self, evicted: AgentMessage):
+        """Fold a message that is about to leave the history window into the summary."""
+        snippet = " ".join(evicted.content.split())[:SUMMARY_SNIPPET_CHARS]
+        summary = f"{self._summary}\n{evicted.role}: {snippet}" if self._summary else f"{evicted.role}: {snippet}"
+        # Keep the most recent part of the summary when it outgrows the budget
+        self._summary = summary[-SUMMARY_MAX_CHARS:]
+    
     async def think(self, prompt: str, context: Optional[Dict] = None) -> str:
         """
         Have the agent think about a problem using the LLM.
@@ -81,21 +152,29 @@ class BaseAgent(ABC):
                 "Get a key at: https://ai.google.dev/"
             )
         
-        # Build full prompt with system context
-        full_prompt = f"""You are {self.name}, {self.role}.
-
-{self.system_prompt}
-
-Context: {json.dumps(context, indent=2) if context else 'None'}
-
-Task: {prompt}
+        # Only the per-turn part is rebuilt; the system prefix is reused
+        earlier = f"Earlier conversation (summary):\n{self._summary}\n\n" if self._summary else ""
+        # Compact JSON keeps the prompt (and token count) small; omit empty context
+        context_block = f"Context: {_dumps(context)}\n\n" if context else ""
+        turn = f"""{earlier}{context_block}Task: {prompt}
 
 Respond thoughtfully and concisely:"""
         
         # Get response from LLM
         try:
-            response = await self.llm.ainvoke(full_prompt)
-            response_text = response.content
+            async with _get_llm_semaphore():
+                if self._native:
+                    response = await self.llm.models.generate_content(
+                        model=AGENT_MODEL,
+                        contents=turn,
+                        config=self._genai_config
+                    )
+                    response_text = response.text or ""
+                else:
+                    response = await self.llm.ainvoke(
+                        self._base_messages + [HumanMessage(content=turn)]
+                    )
+                    response_text = response.content
             
             # Log interaction
             self.add_message("user", prompt, {"context": context})
@@ -107,6 +186,26 @@ Respond thoughtfully and concisely:"""
             print(error_msg)
             raise
     
+    async def think_many(
+        self,
+        prompts: List[str],
+        contexts: Optional[List[Optional[Dict]]] = None
+    ) -> List[str]:
+        """
+        Run several independent prompts concurrently.
+        
+        Args:
+            prompts: Prompts to send
+            contexts: Optional per-prompt context (same length as prompts)
+            
+        Returns:
+            Responses in the same order as prompts
+        """
+        contexts = contexts or [None] * len(prompts)
+        return list(await asyncio.gather(
+            *(self.think(p, context=c) for p, c in zip(prompts, contexts))
+        ))
+    
     @abstractmethod
     async def execute_task(self, task: Dict) -> Dict:
         """
@@ -122,9 +221,10 @@ Respond thoughtfully and concisely:"""
     
     def get_conversation_history(self) -> List[Dict]:
         """Get conversation history as list of dictionaries."""
-        return [msg.to_dict() for msg in self.conversation_history]
+        return list(map(AgentMessage.to_dict, self.conversation_history))
     
     def clear_history(self):
         """Clear conversation history."""
-        self.conversation_history = []
+        self.conversation_history.clear()
+        self._summary = ""
 
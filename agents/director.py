@@ -111,16 +111,23 @@ Respond with ranked list and brief justification."""
         """Coordinate activities of other agents."""
         agent_statuses = task.get("agent_statuses", {})
         
-        prompt = f"""Current agent statuses:
+        overview = chr(10).join(f"- {agent}: {status}" for agent, status in agent_statuses.items())
+        agents = list(agent_statuses)
+        
+        # Each agent's directive is independent, so ask for them in parallel
+        prompts = [
+            f"""Current agent statuses:
 
-{chr(10).join(f"- {agent}: {status}" for agent, status in agent_statuses.items())}
+{overview}
 
-What should each agent focus on next? Provide clear, actionable directions."""
-        
-        response = await self.think(prompt, context=agent_statuses)
+What should the {agent} agent focus on next? Provide clear, actionable directions."""
+            for agent in agents
+        ]
+        responses = await self.think_many(prompts, [agent_statuses] * len(prompts))
         
         return {
             "status": "coordinated",
-            "directives": response
+            "directives": chr(10).join(
+                f"{agent}: {response}" for agent, response in zip(agents, responses)
+            )
         }
-
@@ -81,21 +81,26 @@ Provide:
         """Identify specific issues from test failures."""
         failures = task.get("failures", [])
         
-        prompt = f"""These test cases failed:
+        # Analyze failures in chunks concurrently instead of truncating to 10
+        chunk_size = 10
+        chunks = [failures[i:i + chunk_size] for i in range(0, len(failures), chunk_size)] or [[]]
+        prompts = [
+            f"""These test cases failed:
 
-{chr(10).join(f"{i+1}. {failure}" for i, failure in enumerate(failures[:10]))}
+{chr(10).join(f"{n * chunk_size + i + 1}. {failure}" for i, failure in enumerate(chunk))}
 
 Analyze and identify:
 1. Common patterns in failures
 2. Root causes
 3. Which document types are most problematic
 4. Specific improvements needed"""
-        
-        response = await self.think(prompt, context={"failures": failures})
+            for n, chunk in enumerate(chunks)
+        ]
+        responses = await self.think_many(prompts, [{"failures": chunk} for chunk in chunks])
         
         return {
             "status": "issues_identified",
-            "issues": response,
+            "issues": "\n\n".join(responses),
             "failure_count": len(failures)
         }
     
@@ -1,9 +1,10 @@
-import io, os, re, threading
-from functools import lru_cache
+import io, os, re, time, asyncio, threading, hashlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Tuple, Optional
-from fastapi import FastAPI, File, UploadFile, Query, Request
-from fastapi.responses import PlainTextResponse, JSONResponse, HTMLResponse
+from typing import AsyncIterator, List, Tuple, Optional
+from fastapi import FastAPI, File, UploadFile, Query, Request, HTTPException
+from fastapi.responses import PlainTextResponse, JSONResponse, HTMLResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from PIL import Image, ImageOps
 import numpy as np
@@ -11,15 +12,27 @@ import pytesseract
 import cv2
 import httpx
 
+# In-process Tesseract: no subprocess spawn or model reload per call
+try:
+    from tesserocr import PyTessBaseAPI, OEM
+    TESSEROCR_AVAILABLE = True
+except ImportError:
+    TESSEROCR_AVAILABLE = False
+
 # New OCR Pipeline
-from ocr_pipeline.router import OCRRouter
+from ocr_pipeline.router import get_router
 from ocr_pipeline.postprocessor import OCRPostProcessor
+from ocr_pipeline.batch_queue import AsyncBatchQueue
+from ocr_pipeline.engines.tesseract_engine import _layout_text
+from ocr_pipeline.http import JSON_HEADERS, _json_dumps, _json_loads, aclose_clients, get_ollama_client
+from ocr_pipeline import configure_logging
 from config import settings
 
+configure_logging(settings.log_level)
+
 # --- Surya (handwriting/messy) ---
-from surya.detection import DetectionPredictor
-from surya.recognition import RecognitionPredictor
-from surya.foundation import FoundationPredictor
+# Predictors are process-wide singletons shared with the pipeline's SuryaEngine
+from ocr_pipeline.engines.surya_engine import get_det, get_rec, warm_up as warm_up_surya
 
 app = FastAPI(title="Universal OCR API", version="2.0.0")
 
@@ -33,15 +46,11 @@ app.add_middleware(
 )
 
 # Initialize new OCR components
-ocr_router = None
 ocr_postprocessor = None
 
 def get_ocr_router():
-    """Lazy initialization of OCR router."""
-    global ocr_router
-    if ocr_router is None:
-        ocr_router = OCRRouter()
-    return ocr_router
+    """Lazy initialization of OCR router (shared with the test orchestrator)."""
+    return get_router()
 
 def get_postprocessor():
     """Lazy initialization of post-processor."""
@@ -50,185 +59,532 @@ def get_postprocessor():
         ocr_postprocessor = OCRPostProcessor()
     return ocr_postprocessor
 
-# ---------------- Surya lazy-singletons ----------------
-@lru_cache(maxsize=1)
-def get_foundation():
-    return FoundationPredictor()
-
-@lru_cache(maxsize=1)
-def get_det():
-    return DetectionPredictor()
+@app.on_event("startup")
+async def _size_default_executor():
+    # asyncio.to_thread uses the default executor; size it to the machine
+    workers = settings.ocr_worker_threads or os.cpu_count() or 4
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ocr")
+    )
 
-@lru_cache(maxsize=1)
-def get_rec():
-    return RecognitionPredictor(get_foundation())
+@app.on_event("startup")
+async def _warm_surya():
+    # Load models and run one dummy inference before the first request
+    # instead of during it
+    if os.getenv("WARM_SURYA", "1") == "1":
+        try:
+            await asyncio.to_thread(warm_up_surya)
+        except Exception as e:
+            print(f"Warning: Surya warm-up failed: {e}")
 
 def _extract_surya(preds_obj) -> Tuple[str, list]:
     # preds_obj has .text_lines with .text for each line
-    if hasattr(preds_obj, "text_lines"):
-      lines = []
-      for ln in getattr(preds_obj, "text_lines", []):
-        text = getattr(ln, "text", "") or ""
-        lines.append(text)
-      return "\n".join([t for t in lines if t]), []
-    return str(preds_obj), []
-
-def run_surya_bytes(image_bytes: bytes) -> Tuple[str, list]:
-    img = Image.open(io.BytesIO(image_bytes)).convert("RGB")
-    rec = get_rec(); det = get_det()
-    preds = rec([img], det_predictor=det)[0]
+    text_lines = getattr(preds_obj, "text_lines", None)
+    if text_lines is None:
+        return str(preds_obj), []
+    return "\n".join(t for ln in text_lines if (t := getattr(ln, "text", None))), []
+
+# ---------------- Shared image decode ----------------
+def decode_image(image_bytes: bytes) -> np.ndarray:
+    """Decode upload bytes once into a BGR array shared by every engine."""
+    # imdecode applies EXIF orientation itself, so no PIL exif_transpose pass
+    arr = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_COLOR)
+    if arr is None:
+        # Formats OpenCV can't decode (e.g. some GIFs) go through PIL
+        pil = ImageOps.exif_transpose(Image.open(io.BytesIO(image_bytes)))
+        arr = cv2.cvtColor(np.asarray(pil.convert("RGB")), cv2.COLOR_RGB2BGR)
+    return arr
+
+class DecodedUpload:
+    """Upload bytes, their cache key and a lazily decoded array shared by engines."""
+
+    def __init__(self, data: bytes):
+        self.data = data
+        # None disables caching: huge scans rarely repeat and aren't worth hashing
+        self.key = _image_key(data) if len(data) <= CACHE_MAX_BYTES else None
+        self._decoded: Optional[asyncio.Future] = None
+
+    async def array(self) -> np.ndarray:
+        # A shared future so concurrent engines wait on one decode
+        if self._decoded is None:
+            self._decoded = asyncio.ensure_future(asyncio.to_thread(decode_image, self.data))
+        # Shielded: a cancelled waiter (e.g. a client that went away) must
+        # not cancel the decode another engine is still waiting on
+        return await asyncio.shield(self._decoded)
+
+# ---------------- Surya micro-batching ----------------
+SURYA_MAX_BATCH = int(os.getenv("SURYA_MAX_BATCH", "8"))
+SURYA_BATCH_WINDOW = float(os.getenv("SURYA_BATCH_WINDOW_MS", "25")) / 1000.0
+
+async def _surya_predict_batch(imgs: List[Image.Image]) -> list:
+    return await asyncio.to_thread(get_rec(), imgs, det_predictor=get_det())
+
+# Collects images from concurrent requests into one recognition call
+_surya_batcher = AsyncBatchQueue(_surya_predict_batch, SURYA_MAX_BATCH, SURYA_BATCH_WINDOW)
+
+def _to_pil_rgb(arr: np.ndarray) -> Image.Image:
+    if arr.ndim == 2:
+        return Image.fromarray(arr).convert("RGB")
+    return Image.fromarray(cv2.cvtColor(arr, cv2.COLOR_BGR2RGB))
+
+def decode_pil(image_bytes: bytes) -> Image.Image:
+    """Fully decoded, EXIF-oriented RGB image for the PIL-based pipeline."""
+    return _to_pil_rgb(decode_image(image_bytes))
+
+async def run_surya_array(arr: np.ndarray) -> Tuple[str, list]:
+    img = await asyncio.to_thread(_to_pil_rgb, arr)
+    preds = await _surya_batcher.add_request(img)
     return _extract_surya(preds)
 
+async def run_surya_bytes(image_bytes: bytes) -> Tuple[str, list]:
+    return await run_surya_array(await asyncio.to_thread(decode_image, image_bytes))
+
 # ---------------- OpenCV preprocess for Tesseract (print) ----------------
-def _prep_cv(img: Image.Image) -> Image.Image:
-    img = ImageOps.exif_transpose(img)
-    w, h = img.size
+USE_BILATERAL = os.getenv("USE_BILATERAL", "1") != "0"
+# Pages with this much contrast are already near-binary; denoising buys nothing
+BILATERAL_SKIP_STD = 48.0
+_MORPH_KERNEL = np.ones((2, 2), np.uint8)
+
+def _prep_cv(arr: np.ndarray) -> np.ndarray:
+    gray = arr if arr.ndim == 2 else cv2.cvtColor(arr, cv2.COLOR_BGR2GRAY)
+    h, w = gray.shape[:2]
     long_side = max(w, h)
     if long_side > 2200:
         scale = 2200 / long_side
-        img = img.resize((int(w*scale), int(h*scale)))
-    arr = np.array(img)
-    gray = arr if arr.ndim == 2 else cv2.cvtColor(arr, cv2.COLOR_RGB2GRAY)
-    gray = cv2.bilateralFilter(gray, d=7, sigmaColor=40, sigmaSpace=40)
+        gray = cv2.resize(gray, (int(w*scale), int(h*scale)), interpolation=cv2.INTER_AREA)
     std = float(gray.std())
+    if USE_BILATERAL and std < BILATERAL_SKIP_STD:
+        # Smaller kernel: cost grows with d^2 and d=5 keeps text edges intact
+        gray = cv2.bilateralFilter(gray, d=5, sigmaColor=25, sigmaSpace=25)
+        std = float(gray.std())
     if std >= 32.0:
         _, th = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
     else:
         th = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
                                    cv2.THRESH_BINARY, 35, 15)
-    th = cv2.morphologyEx(th, cv2.MORPH_OPEN, np.ones((2,2), np.uint8))
-    return Image.fromarray(th)
+    # Open in place; pytesseract accepts the ndarray directly
+    cv2.morphologyEx(th, cv2.MORPH_OPEN, _MORPH_KERNEL, dst=th)
+    return th
+
+TESS_PSMS = ("6", "4", "11")
+# One worker per PSM; tesseract runs as a subprocess so threads overlap fully
+_tess_pool = ThreadPoolExecutor(max_workers=len(TESS_PSMS), thread_name_prefix="tess")
+
+_tess_local = threading.local()
+
+def _tess_api() -> "PyTessBaseAPI":
+    # One engine per thread (the API isn't thread-safe); PSM is set per call
+    api = getattr(_tess_local, "api", None)
+    if api is None:
+        api = PyTessBaseAPI(lang="eng", oem=OEM.LSTM_ONLY)
+        api.SetVariable("preserve_interword_spaces", "1")
+        _tess_local.api = api
+    return api
+
+def _tess_both(img: np.ndarray, psm: str) -> Tuple[str, float]:
+    """Text and mean word confidence from a single recognition pass."""
+    if TESSEROCR_AVAILABLE:
+        api = _tess_api()
+        api.SetPageSegMode(int(psm))
+        api.SetImage(Image.fromarray(img))
+        api.SetSourceResolution(300)
+        text = api.GetUTF8Text()
+        confs = api.AllWordConfidences()
+        return text, float(sum(confs) / len(confs)) if confs else 0.0
 
-def _tess_text(img: Image.Image, psm: str) -> str:
     cfg = f"--oem 1 --psm {psm} -l eng --dpi 300 -c preserve_interword_spaces=1"
-    return pytesseract.image_to_string(img, config=cfg)
-
-def _tess_conf(img: Image.Image, psm: str) -> float:
-    cfg = f"--oem 1 --psm {psm} -l eng --dpi 300"
     data = pytesseract.image_to_data(img, config=cfg, output_type=pytesseract.Output.DICT)
-    confs = [int(c) for c in data.get("conf", []) if c not in ("-1", -1)]
-    return float(sum(confs) / len(confs)) if confs else 0.0
-
-def run_tesseract_bytes(image_bytes: bytes) -> Tuple[str, float]:
-    pil = Image.open(io.BytesIO(image_bytes))
-    proc = _prep_cv(pil)
-    best_text, best_conf = "", 0.0
-    for psm in ("6", "4", "11"):
-        txt = _tess_text(proc, psm=psm).strip()
-        conf = _tess_conf(proc, psm=psm)
+    # One C-level parse of the column (ints or numeric strings); -1 marks non-words
+    confs = np.asarray(data.get("conf", []), dtype=np.float64)
+    confs = confs[confs >= 0]
+    conf = float(confs.mean()) if confs.size else 0.0
+
+    # Rebuild the text the way image_to_string lays it out
+    words = [
+        (word, (block, par, line))
+        for word, block, par, line in zip(data["text"], data["block_num"],
+                                          data["par_num"], data["line_num"])
+        if word and word.strip()
+    ]
+    return _layout_text(words), conf
+
+def run_tesseract_array(arr: np.ndarray) -> Tuple[str, float]:
+    proc = _prep_cv(arr)
+    # PSM 6 alone is usually decisive on clean prints; only fan out the
+    # remaining modes when it isn't clearly good
+    first, *rest = TESS_PSMS
+    txt, conf = _tess_both(proc, first)
+    txt = txt.strip()
+    if txt and conf >= settings.tesseract_early_exit_confidence:
+        return txt, conf
+    best_text, best_conf = (txt, conf) if txt and conf > 0.0 else ("", 0.0)
+    for txt, conf in _tess_pool.map(lambda psm: _tess_both(proc, psm), rest):
+        txt = txt.strip()
         if conf > best_conf and txt:
             best_text, best_conf = txt, conf
     return best_text, best_conf
 
+def run_tesseract_bytes(image_bytes: bytes) -> Tuple[str, float]:
+    return run_tesseract_array(decode_image(image_bytes))
+
+# ---------------- Result cache (keyed by image content hash) ----------------
+RESULT_CACHE_SIZE = int(os.getenv("OCR_RESULT_CACHE_SIZE", "256"))
+CACHE_MAX_BYTES = int(os.getenv("OCR_CACHE_MAX_BYTES", str(10 * 1024 * 1024)))
+_tess_cache: "OrderedDict[bytes, Tuple[str, float]]" = OrderedDict()
+_surya_cache: "OrderedDict[bytes, Tuple[str, list]]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+def _image_key(image_bytes: bytes) -> bytes:
+    return hashlib.blake2b(image_bytes, digest_size=16).digest()
+
+def _cache_get(cache: OrderedDict, key: Optional[bytes]):
+    if key is None:
+        return None
+    with _cache_lock:
+        hit = cache.get(key)
+        if hit is not None:
+            cache.move_to_end(key)
+        return hit
+
+def _cache_put(cache: OrderedDict, key: Optional[bytes], value, maxsize: int = RESULT_CACHE_SIZE) -> None:
+    if key is None:
+        return
+    with _cache_lock:
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > maxsize:
+            cache.popitem(last=False)
+
+async def _run_tesseract_cached(upload: "DecodedUpload") -> Tuple[str, float]:
+    hit = _cache_get(_tess_cache, upload.key)
+    if hit is None:
+        # CPU-bound: keep it off the event loop
+        hit = await asyncio.to_thread(run_tesseract_array, await upload.array())
+        _cache_put(_tess_cache, upload.key, hit)
+    return hit
+
+async def _run_surya_cached(upload: "DecodedUpload") -> Tuple[str, list]:
+    hit = _cache_get(_surya_cache, upload.key)
+    if hit is None:
+        hit = await run_surya_array(await upload.array())
+        _cache_put(_surya_cache, upload.key, hit)
+    return hit
+
+# Auto mode starts Surya alongside Tesseract so a fallback costs max(), not
+# sum(); this caps how many such speculative runs can hold the GPU at once
+SURYA_SPECULATIVE = int(os.getenv("SURYA_SPECULATIVE", "2"))
+# Only pages this flat (grey-level std) are likely to fall back: crisp print
+# is strongly bimodal, faint scans and photos of handwriting are not
+SURYA_SPECULATE_MAX_STD = float(os.getenv("SURYA_SPECULATE_MAX_STD", "40"))
+_surya_spec_running = 0  # Event-loop only, so a plain counter is enough
+
+def _likely_fallback(arr: np.ndarray) -> bool:
+    # Every 8th pixel each way is plenty to tell a crisp print from a flat page
+    return float(arr[::8, ::8].std()) < SURYA_SPECULATE_MAX_STD
+
+def _speculation_done(task: asyncio.Task) -> None:
+    global _surya_spec_running
+    _surya_spec_running -= 1
+    # Retrieve the outcome so an unneeded run that failed isn't logged as
+    # an exception nobody awaited
+    if not task.cancelled():
+        task.exception()
+
+def _start_speculative_surya(upload: "DecodedUpload") -> Optional[asyncio.Task]:
+    """
+    Start Surya next to Tesseract when a slot is free, else return None.
+    
+    The run is never cancelled once started (a batch already handed to the
+    GPU would keep going anyway); its slot is held until it really finishes,
+    and an unneeded result still lands in the Surya cache.
+    """
+    global _surya_spec_running
+    if _surya_spec_running >= SURYA_SPECULATIVE:
+        return None
+    _surya_spec_running += 1
+    task = asyncio.ensure_future(_run_surya_cached(upload))
+    task.add_done_callback(_speculation_done)
+    return task
+
+# Whole-response cache: (endpoint, image hash, params) -> final body
+RESPONSE_CACHE_SIZE = int(os.getenv("OCR_RESPONSE_CACHE_SIZE", "512"))
+RESPONSE_CACHE_TTL = float(os.getenv("OCR_RESPONSE_CACHE_TTL", "3600"))
+_response_cache: "OrderedDict[tuple, Tuple[float, str]]" = OrderedDict()
+
+def _response_get(key: Optional[tuple]) -> Optional[str]:
+    hit = _cache_get(_response_cache, key)
+    if hit is None:
+        return None
+    stored_at, body = hit
+    if time.monotonic() - stored_at > RESPONSE_CACHE_TTL:
+        return None
+    return body
+
+def _response_put(key: Optional[tuple], body: str) -> None:
+    _cache_put(_response_cache, key, (time.monotonic(), body), RESPONSE_CACHE_SIZE)
+
+async def _stream_and_cache(key: Optional[tuple], chunks: AsyncIterator[str]) -> AsyncIterator[str]:
+    # Only a fully streamed body is cached: chunks raise unless the upstream
+    # reply completed, and an exception here skips the put
+    parts = []
+    async for chunk in chunks:
+        parts.append(chunk)
+        yield chunk
+    # Stored stripped, the same as md_ollama's non-streamed result
+    _response_put(key, "".join(parts).rstrip())
+
 # ---------------- Cleanup helpers ----------------
-MULTI_PUNCT   = re.compile(r'([.,;:!?])\1{1,}')
-MULTI_SPACE   = re.compile(r'[ \t]{2,}')
-SPACE_BEFORE  = re.compile(r'\s+([.,;:!?])')
 WHITELIST_RE  = re.compile(r'^\s*(x\.?|note)\s*$', re.I)
+# One pass for: collapse repeated punctuation, drop whitespace before it,
+# and squeeze runs of spaces/tabs (see _punct_space_repl)
+PUNCT_SPACE   = re.compile(r'\s*([.,;:!?])\1*|[ \t]{2,}')
+NON_ALNUM_RE  = re.compile(r'[^\w\s]|_')  # same set as "not (isalnum or isspace)"
+WORD_3PLUS_RE = re.compile(r'[A-Za-z]{3,}')
+# Anything that isn't alnum, whitespace or common OCR punctuation (\w covers "_")
+UNCLEAN_RE    = re.compile(r"""[^\w\s.,;:!?()\[\]{}\-/\\'"]""")
+_SYMBOL_TRANS = str.maketrans({'·': '.', '•': '.', '×': 'x', '–': '-', '—': '-'})
 
 def _normalize_symbols(line: str) -> str:
-    return (line.replace('·', '.').replace('•', '.')
-                .replace('×', 'x').replace('–', '-').replace('—', '-'))
+    return line.translate(_SYMBOL_TRANS)
+
+def _punct_space_repl(m: "re.Match") -> str:
+    return m.group(1) or ' '
 
 def _has_word_3plus(line: str) -> bool:
-    return any(len(tok) >= 3 for tok in re.findall(r"[A-Za-z]+", line))
+    return WORD_3PLUS_RE.search(line) is not None
+
+# Per-byte class for ASCII text, derived from the str predicates so the
+# byte-table paths count exactly what isdigit/isalpha/isspace/UNCLEAN_RE would
+_C_OTHER, _C_DIGIT, _C_ALPHA, _C_SPACE, _C_PUNCT = range(5)
+_ASCII_CLASS = [
+    _C_DIGIT if c.isdigit() else _C_ALPHA if c.isalpha() else _C_SPACE if c.isspace()
+    else _C_PUNCT if UNCLEAN_RE.match(c) is None else _C_OTHER
+    for c in map(chr, range(128))
+]
+
+def _ascii_with(*classes: int) -> bytes:
+    return bytes(c for c in range(128) if _ASCII_CLASS[c] in classes)
+
+# Delete tables for bytes.translate(None, ...): each count is one C loop
+_DIGIT_ASCII    = _ascii_with(_C_DIGIT)
+_ALPHA_ASCII    = _ascii_with(_C_ALPHA)
+_ALNUM_SP_ASCII = _ascii_with(_C_DIGIT, _C_ALPHA, _C_SPACE)
+# ASCII bytes that looks_bad counts as unclean
+_UNCLEAN_ASCII  = _ascii_with(_C_OTHER)
+
+def _char_stats(line: str) -> Tuple[int, int, int]:
+    """(digits, letters, non-alnum-non-space) for a line."""
+    if line.isascii():
+        b = line.encode('ascii')
+        n = len(b)
+        return (n - len(b.translate(None, _DIGIT_ASCII)),
+                n - len(b.translate(None, _ALPHA_ASCII)),
+                len(b.translate(None, _ALNUM_SP_ASCII)))
+    return (sum(map(str.isdigit, line)), sum(map(str.isalpha, line)),
+            len(NON_ALNUM_RE.findall(line)))
 
 def _ratio_non_alnum(line: str) -> float:
     if not line: return 1.0
-    total = len(line)
-    non_alnum = sum(0 if (ch.isalnum() or ch.isspace()) else 1 for ch in line)
-    return non_alnum / max(total, 1)
+    return _char_stats(line)[2] / len(line)
 
 def _is_mostly_punct_or_symbols(line: str, thresh: float = 0.55) -> bool:
     if not line.strip(): return True
     return _ratio_non_alnum(line) >= thresh
 
-def _is_numbery(line: str, thresh_digits: float = 0.6) -> bool:
-    s = line.strip()
-    if not s: return True
-    if WHITELIST_RE.match(s): return False
-    digits = sum(ch.isdigit() for ch in s)
-    return (digits / len(s)) >= thresh_digits
+def _drop_handwriting(ln: str, s: str) -> bool:
+    # gentler filtering for short/loose lines
+    return _is_mostly_punct_or_symbols(ln, 0.65)
+
+def _drop_aggressive(ln: str, s: str) -> bool:
+    return not _has_word_3plus(s)
 
-def _few_letters(line: str, min_letters: int = 3) -> bool:
-    s = line.strip()
-    if WHITELIST_RE.match(s): return False
-    letters = sum(ch.isalpha() for ch in line)
-    return letters < min_letters
+def _drop_default(ln: str, s: str) -> bool:
+    # clean_text has already kept whitelisted lines, and strip() only removes
+    # whitespace, so one count over ln answers all three checks
+    if not s: return True
+    digits, letters, non_alnum = _char_stats(ln)
+    return (non_alnum / len(ln) >= 0.55) or (digits / len(s) >= 0.6) or (letters < 3)
 
 def clean_text(raw: str, aggressive: bool = False, handwriting: bool = False) -> str:
-    lines = raw.splitlines()
-    out = []
-    for ln in lines:
-        ln = _normalize_symbols(ln)
+    # Pick the line filter once rather than re-branching on every line
+    drop = _drop_handwriting if handwriting else (_drop_aggressive if aggressive else _drop_default)
+    keep_whitelisted = WHITELIST_RE.match
+    fix = PUNCT_SPACE.sub
+
+    def clean_line(ln: str) -> str:
         s = ln.strip()
-        if WHITELIST_RE.match(s):  # keep "x" / "note"
-            out.append(s); continue
-        if handwriting:
-            # gentler filtering for short/loose lines
-            if _is_mostly_punct_or_symbols(ln, 0.65):
-                continue
-        else:
-            if aggressive:
-                if not _has_word_3plus(s): continue
-            else:
-                if _is_mostly_punct_or_symbols(ln) or _is_numbery(ln) or _few_letters(ln):
-                    continue
-        ln = MULTI_PUNCT.sub(r'\1', ln)
-        ln = SPACE_BEFORE.sub(r'\1', ln)
-        ln = MULTI_SPACE.sub(' ', ln).strip()
-        if ln: out.append(ln)
-    text = "\n".join(out)
-    text = re.sub(r'\n{3,}', '\n\n', text).strip()
-    return text
+        if keep_whitelisted(s):  # keep "x" / "note"
+            return s
+        if drop(ln, s):
+            return ''
+        return fix(_punct_space_repl, ln).strip()
+
+    # Symbol mapping is 1:1 and never touches newlines, so do it once up front.
+    # Kept lines are stripped and non-empty, so the join has no blank runs to
+    # collapse and nothing to strip
+    return "\n".join(filter(None, map(clean_line, _normalize_symbols(raw).splitlines())))
 
 def looks_bad(t: str, avg_conf: float, min_words: int, min_clean_ratio: float, min_avg_conf: float) -> bool:
-    if not t or not t.strip(): return True
+    if not t or t.isspace(): return True
+    # Cheapest checks first; the character scan only runs if both pass
+    if avg_conf < min_avg_conf: return True
+    if len(t.split()) < min_words: return True
     total = len(t)
-    clean = sum(ch.isalnum() or ch.isspace() or ch in ".,;:!?()[]{}-_/\\'\"" for ch in t)
-    ratio = clean / max(total, 1)
-    words = len(t.split())
-    return (words < min_words) or (ratio < min_clean_ratio) or (avg_conf < min_avg_conf)
+    if t.isascii():
+        # Whole page in one C pass: delete the unclean bytes, count what's left
+        clean = len(t.encode('ascii').translate(None, _UNCLEAN_ASCII))
+    else:
+        clean = total - len(UNCLEAN_RE.findall(t))
+    return clean / total < min_clean_ratio
+
+def needs_fallback(t: str, avg_conf: float, min_words: int, min_clean_ratio: float, min_avg_conf: float) -> bool:
+    # Clearly confident Tesseract output skips the character-ratio scan
+    if t and avg_conf >= min_avg_conf + 10:
+        return False
+    return looks_bad(t, avg_conf, min_words, min_clean_ratio, min_avg_conf)
 
 # ---------------- Markdown formatting ----------------
-OLLAMA_HOST = os.getenv("OLLAMA_HOST", "http://127.0.0.1:11434")
+# Same setting (OLLAMA_HOST) the shared pipeline client connects to
+OLLAMA_HOST = settings.ollama_host
 DEFAULT_MD_MODEL = os.getenv("DEFAULT_MD_MODEL", "gemma3:12b-it-q8_0")
 MD_SYSTEM_PROMPT = os.getenv("MD_SYSTEM_PROMPT",
     "You convert raw OCR text into clean, faithful Markdown. Preserve meaning. "
     "Prefer accuracy over creativity. Use lists and tables only when obvious. Output Markdown only."
 )
 
+MD_FAST_PATH_CHARS = int(os.getenv("MD_FAST_PATH_CHARS", "200"))
+MD_HINT_RE = re.compile(r'^(#{1,6} |[-*] |\d+\. |\|)', re.M)
+
+def _looks_markdown(text: str) -> bool:
+    return MD_HINT_RE.search(text) is not None
+
+# Static part of the prompt, built once at import
+_MD_PROMPT_HEAD = f"{MD_SYSTEM_PROMPT}\n\nOCR text:\n```\n"
+
 def _build_md_prompt(text: str) -> str:
-    return (
-        f"{MD_SYSTEM_PROMPT}\n\n"
-        "OCR text:\n"
-        "```\n" + text + "\n```"
-    )
+    return _MD_PROMPT_HEAD + text + "\n```"
+
+@app.on_event("shutdown")
+async def _close_http_clients():
+    await aclose_clients()
+
+MD_SPACES_RE = re.compile(r'[ \t]+')
+MD_DOTS_RE   = re.compile(r'(\. ?){3,}')
+MD_BLANKS_RE = re.compile(r'\n{2,}')
+MD_BULLET_RE = re.compile(r'^[*-]\s+', re.MULTILINE)
 
 async def md_regex(text: str) -> str:
-    import re
-    t = re.sub(r'[ \t]+', ' ', text)
-    t = re.sub(r'(\. ?){3,}', '…', t)
-    t = re.sub(r'\n{2,}', '\n\n', t)
-    t = re.sub(r'^[*-]\s+', '- ', t, flags=re.MULTILINE)
+    t = MD_SPACES_RE.sub(' ', text)
+    t = MD_DOTS_RE.sub('…', t)
+    t = MD_BLANKS_RE.sub('\n\n', t)
+    t = MD_BULLET_RE.sub('- ', t)
     return t.strip()
 
-async def md_ollama(text: str, model: str) -> str:
-    payload = {
+def _md_payload(text: str, model: str, stream: bool) -> dict:
+    return {
         "model": model,
         "prompt": _build_md_prompt(text),
-        "stream": False,
+        "stream": stream,
         "options": {
             "temperature": 0.1,
             "repeat_penalty": 1.05,
             "num_ctx": 4096
         }
     }
-    async with httpx.AsyncClient(timeout=120.0) as client:
-        r = await client.post(f"{OLLAMA_HOST}/api/generate", json=payload)
-        r.raise_for_status()
-        data = r.json()
-    return (data.get("response") or "").strip()
+
+async def _md_chunks(lines: AsyncIterator[str]) -> AsyncIterator[str]:
+    """Markdown text from Ollama's stream lines; raises unless the reply completes."""
+    started = False
+    async for line in lines:
+        if not line:
+            continue
+        msg = _json_loads(line)
+        if "error" in msg:
+            raise RuntimeError(f"Ollama error: {msg['error']}")
+        chunk = msg.get("response") or ""
+        if not started:
+            # Match the non-streaming output, which is stripped
+            chunk = chunk.lstrip()
+            started = bool(chunk)
+        if chunk:
+            yield chunk
+        if msg.get("done"):
+            return
+    raise RuntimeError("Ollama stream ended before the reply was done")
+
+async def _md_stream_body(r: httpx.Response, first: Optional[str],
+                          chunks: AsyncIterator[str]) -> AsyncIterator[str]:
+    try:
+        if first is not None:
+            yield first
+        async for chunk in chunks:
+            yield chunk
+    finally:
+        await r.aclose()
+
+async def md_ollama_stream(text: str, model: str) -> AsyncIterator[str]:
+    """
+    Start an Ollama Markdown generation and return an iterator of its chunks.
+    
+    The HTTP status and the first chunk are checked before this returns, so
+    an unpulled model or an Ollama error still becomes a 5xx instead of a
+    200 with an empty body. Failing later raises mid-iteration (aborting the
+    response) rather than ending the stream as if it were complete.
+    """
+    body = _json_dumps(_md_payload(text, model, True))
+    # The pipeline's keep-alive pool, so the process holds one set of
+    # connections to Ollama
+    client = get_ollama_client()
+    request = client.build_request("POST", "/api/generate", content=body, headers=JSON_HEADERS)
+    r = await client.send(request, stream=True)
+    try:
+        if r.is_error:
+            await r.aread()
+            r.raise_for_status()
+        chunks = _md_chunks(r.aiter_lines())
+        first = await anext(chunks, None)
+    except BaseException:
+        await r.aclose()
+        raise
+    return _md_stream_body(r, first, chunks)
+
+async def md_ollama(text: str, model: str) -> str:
+    parts = [chunk async for chunk in await md_ollama_stream(text, model)]
+    return "".join(parts).strip()
+
+# ---------------- Upload handling ----------------
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(25 * 1024 * 1024)))
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+
+def _read_sized(f, size: int) -> bytearray:
+    # Fill one exactly-sized buffer straight from the spooled file: no
+    # per-chunk bytes objects and no regrowth copies
+    buf = bytearray(size)
+    with memoryview(buf) as view:
+        filled = 0
+        while filled < size:
+            n = f.readinto(view[filled:])
+            if not n:
+                break
+            filled += n
+    del buf[filled:]
+    return buf
+
+async def read_upload(upload: UploadFile) -> bytearray:
+    """Read an upload in chunks, rejecting it as soon as it exceeds MAX_UPLOAD_BYTES."""
+    if upload.size is not None and upload.size > MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail=f"Upload exceeds {MAX_UPLOAD_BYTES} bytes")
+    if upload.size is not None:
+        # Size is known once the form is parsed; read it in one worker-thread call
+        await upload.seek(0)
+        return await asyncio.to_thread(_read_sized, upload.file, upload.size)
+    buf = bytearray()
+    while chunk := await upload.read(UPLOAD_CHUNK_BYTES):
+        buf.extend(chunk)
+        if len(buf) > MAX_UPLOAD_BYTES:
+            raise HTTPException(status_code=413, detail=f"Upload exceeds {MAX_UPLOAD_BYTES} bytes")
+    # bytearray is accepted everywhere bytes are used (hashing, imdecode, BytesIO)
+    return buf
 
 @app.get("/healthz")
 def healthz():
@@ -239,6 +595,32 @@ def health():
     """Health check endpoint for Docker/Kubernetes."""
     return {"status": "healthy", "ok": True}
 
+async def _extract_text(upload: DecodedUpload, engine: str, min_words: int,
+                        min_clean_ratio: float, min_avg_conf: float,
+                        clean: int, handwriting: int) -> str:
+    if engine == "surya" or handwriting == 1:
+        txt, _ = await _run_surya_cached(upload)
+    elif engine == "tesseract":
+        txt, _ = await _run_tesseract_cached(upload)
+    else:
+        thit = _cache_get(_tess_cache, upload.key)
+        spec = None
+        if (thit is None and _surya_spec_running < SURYA_SPECULATIVE
+                and _likely_fallback(await upload.array())):
+            spec = _start_speculative_surya(upload)
+        ttxt, conf = thit or await _run_tesseract_cached(upload)
+        if needs_fallback(ttxt, conf, min_words, min_clean_ratio, min_avg_conf) or handwriting == 1:
+            # Shielded so a request cancelled here doesn't cut the run short
+            # and free its slot while the GPU is still busy with it
+            txt, _ = await asyncio.shield(spec) if spec else await _run_surya_cached(upload)
+        else:
+            # An unneeded run is left to finish, still counted against the cap
+            txt = ttxt
+    if not clean:
+        return txt
+    # A long page is milliseconds of regex work; other requests keep running
+    return await asyncio.to_thread(clean_text, txt, aggressive=(clean==2), handwriting=bool(handwriting))
+
 @app.post("/ocr_text")
 async def ocr_text(
     image: UploadFile = File(...),
@@ -249,19 +631,15 @@ async def ocr_text(
     clean: int = Query(1, ge=0, le=2),
     handwriting: int = Query(0, ge=0, le=1)
 ):
-    data = await image.read()
-    if engine == "surya" or handwriting == 1:
-        txt, _ = run_surya_bytes(data)
-        return PlainTextResponse(clean_text(txt, aggressive=(clean==2), handwriting=bool(handwriting)) if clean else txt)
-    if engine == "tesseract":
-        txt, _conf = run_tesseract_bytes(data)
-        return PlainTextResponse(clean_text(txt, aggressive=(clean==2), handwriting=False) if clean else txt)
-    ttxt, conf = run_tesseract_bytes(data)
-    if looks_bad(ttxt, conf, min_words, min_clean_ratio, min_avg_conf) or handwriting == 1:
-        txt, _ = run_surya_bytes(data)
-    else:
-        txt = ttxt
-    return PlainTextResponse(clean_text(txt, aggressive=(clean==2), handwriting=bool(handwriting)) if clean else txt)
+    upload = DecodedUpload(await read_upload(image))
+    rkey = None if upload.key is None else (
+        "ocr_text", upload.key, engine, min_words, min_clean_ratio, min_avg_conf, clean, handwriting)
+    body = _response_get(rkey)
+    if body is not None:
+        return PlainTextResponse(body, headers={"X-Cache": "HIT"})
+    body = await _extract_text(upload, engine, min_words, min_clean_ratio, min_avg_conf, clean, handwriting)
+    _response_put(rkey, body)
+    return PlainTextResponse(body, headers={"X-Cache": "MISS"})
 
 @app.post("/ocr_text_md")
 async def ocr_text_md(
@@ -273,27 +651,56 @@ async def ocr_text_md(
     clean: int = Query(1, ge=0, le=2),
     handwriting: int = Query(0, ge=0, le=1),
     md_engine: str = Query("ollama", enum=["regex","ollama"]),
-    md_model: str = Query(None)
+    md_model: str = Query(None),
+    md_force: int = Query(0, ge=0, le=1)
 ):
-    data = await image.read()
-    if engine == "surya" or handwriting == 1:
-        txt, _ = run_surya_bytes(data)
-    elif engine == "tesseract":
-        txt, _ = run_tesseract_bytes(data)
-    else:
-        ttxt, conf = run_tesseract_bytes(data)
-        if looks_bad(ttxt, conf, min_words, min_clean_ratio, min_avg_conf) or handwriting == 1:
-            txt, _ = run_surya_bytes(data)
-        else:
-            txt = ttxt
-    txt = clean_text(txt, aggressive=(clean==2), handwriting=bool(handwriting)) if clean else txt
+    upload = DecodedUpload(await read_upload(image))
+    model = md_model or DEFAULT_MD_MODEL
+    rkey = None if upload.key is None else (
+        "ocr_text_md", upload.key, engine, min_words, min_clean_ratio, min_avg_conf,
+        clean, handwriting, md_engine, model if md_engine == "ollama" else None, md_force)
+    body = _response_get(rkey)
+    if body is not None:
+        return PlainTextResponse(body, headers={"X-Cache": "HIT"})
+    txt = await _extract_text(upload, engine, min_words, min_clean_ratio, min_avg_conf, clean, handwriting)
+
+    # Short or already-structured text gains nothing from an LLM pass
+    if md_engine == "ollama" and not md_force and (len(txt) < MD_FAST_PATH_CHARS or _looks_markdown(txt)):
+        md_engine = "regex"
 
     if md_engine == "regex":
         md = await md_regex(txt)
-    else:
-        model = md_model or DEFAULT_MD_MODEL
-        md = await md_ollama(txt, model)
-    return PlainTextResponse(md)
+        _response_put(rkey, md)
+        return PlainTextResponse(md, headers={"X-Cache": "MISS"})
+    # Awaited here so upstream failures surface before the 200 header is sent
+    chunks = await md_ollama_stream(txt, model)
+    return StreamingResponse(_stream_and_cache(rkey, chunks),
+                             media_type="text/plain", headers={"X-Cache": "MISS"})
+
+MAX_BATCH_IMAGES = int(os.getenv("MAX_BATCH_IMAGES", "32"))
+
+@app.post("/ocr_batch")
+async def ocr_batch(
+    images: List[UploadFile] = File(...),
+    engine: str = Query("auto", enum=["auto","tesseract","surya"]),
+    min_words: int = Query(10, ge=0),
+    min_clean_ratio: float = Query(0.65, ge=0.0, le=1.0),
+    min_avg_conf: float = Query(60.0, ge=0.0, le=100.0),
+    clean: int = Query(1, ge=0, le=2),
+    handwriting: int = Query(0, ge=0, le=1)
+):
+    """OCR several images in one request; returns cleaned texts in upload order."""
+    if len(images) > MAX_BATCH_IMAGES:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH_IMAGES} images per batch")
+    datas = await asyncio.gather(*(read_upload(im) for im in images))
+    # Processed concurrently: Tesseract fans out over threads and the Surya
+    # submissions land in the same micro-batch window
+    texts = await asyncio.gather(*(
+        _extract_text(DecodedUpload(data), engine, min_words, min_clean_ratio,
+                      min_avg_conf, clean, handwriting)
+        for data in datas
+    ))
+    return JSONResponse(list(texts))
 
 # ============================================================================
 # NEW UNIVERSAL OCR ENDPOINT - Automatic document handling
@@ -334,8 +741,8 @@ async def ocr_universal(
         if use_intelligent_pipeline:
             from ocr_pipeline.intelligent_pipeline import IntelligentOCRPipeline
             
-            image_bytes = await image.read()
-            pil_image = Image.open(io.BytesIO(image_bytes))
+            image_bytes = await read_upload(image)
+            pil_image = await asyncio.to_thread(decode_pil, image_bytes)
             
             pipeline = IntelligentOCRPipeline()
             result = await pipeline.process(pil_image)
@@ -355,8 +762,10 @@ async def ocr_universal(
         # Original pipeline
 
         # Read image
-        image_bytes = await image.read()
-        pil_image = Image.open(io.BytesIO(image_bytes))
+        image_bytes = await read_upload(image)
+        # Decoded once here; Image.open is lazy and every engine and the
+        # classifier would otherwise decode and convert it again
+        pil_image = await asyncio.to_thread(decode_pil, image_bytes)
         
         # Get router and processor
         router = get_ocr_router()
@@ -368,7 +777,7 @@ async def ocr_universal(
         # Clean text if requested
         text = result.text
         if clean:
-            text = processor.clean_text(text, aggressive=False)
+            text = await asyncio.to_thread(processor.clean_text, text, aggressive=False)
         
         # Format based on request
         if format == "json":
@@ -385,6 +794,8 @@ async def ocr_universal(
         else:  # text
             return PlainTextResponse(text)
     
+    except HTTPException:
+        raise
     except Exception as e:
         return JSONResponse(
             {"error": str(e), "details": "OCR processing failed"},
@@ -408,12 +819,11 @@ async def ocr_status():
         # Check Ollama connection
         ollama_status = "unknown"
         try:
-            async with httpx.AsyncClient(timeout=5.0) as client:
-                response = await client.get(f"{settings.ollama_host}/api/tags")
-                if response.status_code == 200:
-                    ollama_status = "connected"
-                    models = response.json().get("models", [])
-                    engines_status["ollama_models"] = [m.get("name") for m in models]
+            response = await get_ollama_client().get("/api/tags", timeout=5.0)
+            if response.status_code == 200:
+                ollama_status = "connected"
+                models = response.json().get("models", [])
+                engines_status["ollama_models"] = [m.get("name") for m in models]
         except Exception:
             ollama_status = "disconnected"
         
@@ -20,11 +20,24 @@ class Settings(BaseSettings):
     # Provider: ollama (local), gemini (Google), openai (GPT-4), anthropic (Claude), openrouter
     vision_provider: str = "ollama"
     vision_model: str = "qwen2.5vl:7b"  # Model to use for the selected vision provider
+    vision_concurrency: int = 8  # Max in-flight requests for multi-image analyze_many()
+    vision_grayscale: bool = False  # Send pages as 8-bit grayscale (smaller; loses ink/highlight colour)
+    vision_cache_enabled: bool = False  # Reuse stored responses for identical image+prompt+model
+    vision_cache_path: str = "./data/vision_cache.db"
+    vision_prompt_cache: bool = True  # Ask Anthropic to cache the page image across a page's passes
+    # Comma-separated providers tried in order when the primary one fails
+    # (each with its own default model), e.g. "gemini,openai"
+    vision_fallback_providers: str = ""
+    vision_fallback_timeout: float = 180.0  # Seconds allowed per provider before moving on
+    # Minimum seconds between calls the router makes to an engine, per engine
+    # name, e.g. "vision_local=0.5"; unlisted engines are not throttled
+    engine_min_intervals: str = ""
     
     # === Text Provider Configuration ===
     # Provider for text processing (formatting, analysis, etc.)
     text_provider: str = "ollama"
     text_model: str = "gemma3:12b-it-q8_0"  # Model to use for the selected text provider
+    text_cache_enabled: bool = False  # Reuse stored markdown formatting for identical OCR text+model (same DB as the vision cache)
     
     # === Provider API Keys (only needed for cloud providers) ===
     gemini_api_key: Optional[str] = None
@@ -37,16 +50,26 @@ class Settings(BaseSettings):
     
     # Default OCR Settings
     use_hybrid_ocr: bool = True  # Run both Tesseract + Surya in parallel
+    pipeline_concurrency: int = 4  # Pages of a multi-page job in the intelligent pipeline at once
+    adaptive_hybrid_ocr: bool = False  # Hybrid mode: wait for Pass 1 and run one engine on pure print/pure handwriting pages
     perfect_tables: bool = False  # Use vision provider specifically for perfect table formatting
+    fuse_vision_passes: bool = False  # Single-engine mode: one vision call does both analysis and correction
+    fusion_skip_similarity: float = 0.98  # Hybrid mode: skip Pass 3 when the two OCR outputs are this similar (0-1; >1 disables)
+    router_short_circuit_threshold: float = 0.9  # Router: skip the second engine when the first (if it measures confidence, i.e. Tesseract) is this confident (0-1; >1 always runs both)
+    ocr_worker_threads: int = 0  # Threads for blocking OCR work (0 = one per CPU)
+    opencv_opencl: bool = False  # Run Tesseract preprocessing through OpenCL (cv2.UMat) when a device exists
     
     # API Configuration
     api_port: int = 5000
     dashboard_port: int = 8080
+    api_workers: int = 1  # >1 runs the API in that many worker processes
     
     # Agent System
     enable_autonomous_agents: bool = True
     require_approval_for_changes: bool = True
     max_concurrent_agent_tasks: int = 2
+    gemini_concurrency: int = 8  # Max in-flight agent LLM calls (rate-limit guard)
+    agent_history_window: int = 12  # Messages kept verbatim per agent; older ones are summarized
     agent_pause_on_user_request: bool = True
     
     # Dashboard
@@ -59,12 +82,14 @@ class Settings(BaseSettings):
     # Database
     database_url: str = "sqlite:///./data/ocr_system.db"
     test_results_db: str = "sqlite:///./data/test_results.db"
+    benchmark_concurrency: int = 0  # Samples tested at once by run_benchmark (0 = one per CPU)
     
     # Logging
     log_level: str = "INFO"
     
     # OCR Engine Configuration
     tesseract_confidence_threshold: float = 60.0
+    tesseract_early_exit_confidence: float = 85.0  # Skip remaining PSM passes above this
     surya_confidence_threshold: float = 0.7
     vision_model_confidence_threshold: float = 0.8
     
@@ -72,6 +97,10 @@ class Settings(BaseSettings):
     handwriting_threshold: float = 0.6
     table_heavy_threshold: float = 0.5
     low_quality_threshold: float = 0.4
+    # Optional local ONNX document classifier (logits in DocumentType order,
+    # LOW_QUALITY excluded); the vision model handles anything below the cutoff
+    classifier_onnx_path: str = ""
+    classifier_min_confidence: float = 0.6
 
 
 # Global settings instance
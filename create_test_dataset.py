@@ -27,20 +27,22 @@ test_datasets = {
 def create_test_datasets():
     """Create test dataset directories and ground truth files."""
     base_path = Path("data/test_datasets")
+    created = []
     
     for category, samples in test_datasets.items():
         images_dir = base_path / category / "images"
         gt_dir = base_path / category / "ground_truth"
         
         images_dir.mkdir(parents=True, exist_ok=True)
-        gt_dir.mkdir(parents=True, exist_ok=True)
+        gt_dir.mkdir(exist_ok=True)  # parent made just above
         
         for sample_id, ground_truth in samples.items():
-            # Save ground truth
+            # Save ground truth (bytes: same LF endings on every OS)
             gt_file = gt_dir / f"{sample_id}.txt"
-            gt_file.write_text(ground_truth, encoding='utf-8')
-            print(f"✓ Created: {gt_file}")
+            gt_file.write_bytes(ground_truth.encode('utf-8'))
+            created.append(f"✓ Created: {gt_file}")
     
+    print("\n".join(created))
     print("\n" + "="*60)
     print("📁 Test dataset structure created!")
     print("="*60)
@@ -3,12 +3,23 @@ from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import HTMLResponse, JSONResponse
 from fastapi.templating import Jinja2Templates
-from fastapi import Request
 from pathlib import Path
-import json
-from typing import List
+from functools import lru_cache
+import asyncio
+from typing import Any, Set
 from config import settings
 
+try:
+    import orjson
+    
+    def _dumps(obj: Any) -> str:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+except ImportError:
+    import json
+    
+    def _dumps(obj: Any) -> str:
+        return json.dumps(obj, separators=(",", ":"), ensure_ascii=False)
+
 # Create dashboard app
 dashboard_app = FastAPI(title="OCR Dashboard")
 
@@ -20,43 +31,54 @@ dashboard_app.mount("/static", StaticFiles(directory=str(dashboard_dir / "static
 # WebSocket connection manager
 class ConnectionManager:
     def __init__(self):
-        self.active_connections: List[WebSocket] = []
+        self.active_connections: Set[WebSocket] = set()
 
     async def connect(self, websocket: WebSocket):
         await websocket.accept()
-        self.active_connections.append(websocket)
+        self.active_connections.add(websocket)
 
     def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
+        self.active_connections.discard(websocket)
 
     async def broadcast(self, message: dict):
-        for connection in self.active_connections:
-            try:
-                await connection.send_json(message)
-            except:
-                pass
+        # Serialize once and send to everyone concurrently, so one slow client
+        # doesn't hold up the rest; text frames, which the page JSON.parses
+        payload = _dumps(message)
+        connections = list(self.active_connections)
+        results = await asyncio.gather(
+            *(connection.send_text(payload) for connection in connections),
+            return_exceptions=True
+        )
+        for connection, result in zip(connections, results):
+            if isinstance(result, Exception):
+                self.disconnect(connection)  # client already gone
 
 manager = ConnectionManager()
 
+@lru_cache(maxsize=None)
+def _render_page(name: str) -> bytes:
+    # The pages use no request data, so each is rendered once and reused
+    return templates.get_template(name).render().encode()
+
 @dashboard_app.get("/", response_class=HTMLResponse)
-async def dashboard_home(request: Request):
+async def dashboard_home():
     """Main dashboard page."""
-    return templates.TemplateResponse("index.html", {"request": request})
+    return HTMLResponse(_render_page("index.html"))
 
 @dashboard_app.get("/config", response_class=HTMLResponse)
-async def config_page(request: Request):
+async def config_page():
     """Configuration page."""
-    return templates.TemplateResponse("config.html", {"request": request})
+    return HTMLResponse(_render_page("config.html"))
 
 @dashboard_app.get("/test", response_class=HTMLResponse)
-async def test_page(request: Request):
+async def test_page():
     """Testing interface page."""
-    return templates.TemplateResponse("test.html", {"request": request})
+    return HTMLResponse(_render_page("test.html"))
 
 @dashboard_app.get("/agents", response_class=HTMLResponse)
-async def agents_page(request: Request):
+async def agents_page():
     """Agent control center page."""
-    return templates.TemplateResponse("agents.html", {"request": request})
+    return HTMLResponse(_render_page("agents.html"))
 
 @dashboard_app.get("/api/config")
 async def get_config():
@@ -86,7 +108,7 @@ async def websocket_endpoint(websocket: WebSocket):
         while True:
             data = await websocket.receive_text()
             # Echo back for now
-            await websocket.send_json({"type": "pong", "data": data})
+            await websocket.send_text(_dumps({"type": "pong", "data": data}))
     except WebSocketDisconnect:
         manager.disconnect(websocket)
 
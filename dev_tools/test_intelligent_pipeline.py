@@ -9,12 +9,14 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 import asyncio
-from PIL import Image
-from ocr_pipeline.intelligent_pipeline import IntelligentOCRPipeline
 
 
 async def test_pipeline(image_path: str):
     """Test the intelligent pipeline on an image."""
+    # Heavy (torch, surya); imported only once the image path checked out
+    from PIL import Image
+    from ocr_pipeline.intelligent_pipeline import IntelligentOCRPipeline
+    
     print("=" * 70)
     print(f"🔍 Testing Intelligent Pipeline: {image_path}")
     print("=" * 70)
@@ -78,5 +80,7 @@ if __name__ == "__main__":
         print(f"❌ Error: Image not found: {image_path}")
         sys.exit(1)
     
+    from ocr_pipeline import configure_logging
+    configure_logging()  # Pipeline progress is logged, not printed
     asyncio.run(test_pipeline(image_path))
 
@@ -12,12 +12,14 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 
 import asyncio
 import json
-from PIL import Image
-from ocr_pipeline.intelligent_pipeline import IntelligentOCRPipeline, DocumentAnalysis
 
 
 async def save_ocr_outputs(image_path: str, output_file: str):
     """Run OCR once and save outputs for reuse."""
+    # Imported lazily: main() validates arguments before anything heavy loads
+    from PIL import Image
+    from ocr_pipeline.intelligent_pipeline import IntelligentOCRPipeline
+    
     print("=" * 70)
     print("💾 SAVING OCR OUTPUTS")
     print("=" * 70)
@@ -65,11 +67,16 @@ async def save_ocr_outputs(image_path: str, output_file: str):
 async def test_pass3_prompt(
     ocr_data_file: str,
     vision_provider: str = "ollama",
-    custom_prompt: str = None
+    custom_prompt: str = None,
+    vision_model: str = None
 ):
     """Test Pass 3 with saved OCR data and custom prompt."""
+    # See save_ocr_outputs
+    from PIL import Image
+    from ocr_pipeline.intelligent_pipeline import IntelligentOCRPipeline, DocumentAnalysis
+    
     print("=" * 70)
-    print(f"🧪 TESTING PASS 3 ({vision_provider.upper()})")
+    print(f"🧪 TESTING PASS 3 ({vision_provider.upper()}{f' / {vision_model}' if vision_model else ''})")
     print("=" * 70)
     
     # Load saved data
@@ -94,6 +101,7 @@ async def test_pass3_prompt(
     # Create pipeline
     pipeline = IntelligentOCRPipeline(
         vision_provider=vision_provider,
+        vision_model=vision_model,
         use_hybrid_ocr=True
     )
     
@@ -126,17 +134,13 @@ async def compare_prompts(ocr_data_file: str):
     print("=" * 70)
     print()
     
-    # Test 1: Ollama (current)
-    print("\n" + "=" * 70)
-    print("1️⃣  OLLAMA (Current Prompt)")
-    print("=" * 70)
-    result_ollama = await test_pass3_prompt(ocr_data_file, vision_provider="ollama")
-    
-    # Test 2: Gemini (current)
-    print("\n" + "=" * 70)
-    print("2️⃣  GEMINI 2.5 Pro (Current Prompt)")
-    print("=" * 70)
-    result_gemini = await test_pass3_prompt(ocr_data_file, vision_provider="gemini")
+    # Ollama (local) and Gemini (cloud) are independent: run them together
+    # so the wait is the slower of the two, not the sum
+    print("Running OLLAMA and GEMINI 2.5 Pro (current prompt) concurrently...")
+    result_ollama, result_gemini = await asyncio.gather(
+        test_pass3_prompt(ocr_data_file, vision_provider="ollama"),
+        test_pass3_prompt(ocr_data_file, vision_provider="gemini")
+    )
     
     # Compare
     print("\n" + "=" * 70)
@@ -203,5 +207,7 @@ async def main():
 
 
 if __name__ == "__main__":
+    from ocr_pipeline import configure_logging
+    configure_logging()  # Pipeline progress is logged, not printed
     asyncio.run(main())
 
@@ -10,12 +10,14 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 import asyncio
-from PIL import Image
-from ocr_pipeline.intelligent_pipeline import IntelligentOCRPipeline
 
 
 async def compare_table_modes(image_path: str):
     """Compare default vs perfect_tables mode."""
+    # Heavy imports live here so the usage message prints instantly
+    from PIL import Image
+    from ocr_pipeline.intelligent_pipeline import IntelligentOCRPipeline
+    
     print("=" * 70)
     print("📊 TABLE QUALITY COMPARISON")
     print("=" * 70)
@@ -24,6 +26,13 @@ async def compare_table_modes(image_path: str):
     
     img = Image.open(image_path)
     
+    # One pipeline for both runs: perfect_tables is a per-call switch, so
+    # the engines and clients are only set up once
+    pipeline = IntelligentOCRPipeline(
+        vision_provider="ollama",
+        use_hybrid_ocr=True
+    )
+    
     # Mode 1: Default (Local, fast, free)
     print("\n" + "=" * 70)
     print("1️⃣  DEFAULT MODE (Local, Fast, Free)")
@@ -32,13 +41,7 @@ async def compare_table_modes(image_path: str):
     print("Cost: $0")
     print()
     
-    pipeline_default = IntelligentOCRPipeline(
-        vision_provider="ollama",
-        use_hybrid_ocr=True,
-        perfect_tables=False
-    )
-    
-    result_default = await pipeline_default.process(img)
+    result_default = await pipeline.process(img, perfect_tables=False)
     
     print()
     print("📄 OUTPUT:")
@@ -54,13 +57,7 @@ async def compare_table_modes(image_path: str):
     print("Cost: ~$0.005/doc (only if document has tables)")
     print()
     
-    pipeline_perfect = IntelligentOCRPipeline(
-        vision_provider="ollama",
-        use_hybrid_ocr=True,
-        perfect_tables=True  # ← The magic flag!
-    )
-    
-    result_perfect = await pipeline_perfect.process(img)
+    result_perfect = await pipeline.process(img, perfect_tables=True)  # ← The magic flag!
     
     print()
     print("📄 OUTPUT:")
@@ -109,5 +106,7 @@ if __name__ == "__main__":
         print(f"❌ Error: Image not found: {image_path}")
         sys.exit(1)
     
+    from ocr_pipeline import configure_logging
+    configure_logging()  # Pipeline progress is logged, not printed
     asyncio.run(compare_table_modes(image_path))
 
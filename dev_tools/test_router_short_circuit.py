@@ -0,0 +1,84 @@
+"""
+Check when OCRRouter skips the second engine.
+
+A confident first engine only short-circuits when its score is measured
+(Tesseract); the vision engine's fixed heuristic confidence must still get
+a second opinion. Uses stand-in engines, so no OCR backend is needed.
+Runs under pytest or directly: python dev_tools/test_router_short_circuit.py
+"""
+import sys
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import asyncio
+from PIL import Image
+
+from config import settings
+from ocr_pipeline.classifier import DocumentType
+from ocr_pipeline.engines.base_engine import BaseOCREngine, OCRResult
+from ocr_pipeline.router import OCRRouter
+
+
+class FakeEngine(BaseOCREngine):
+    def __init__(self, name: str, confidence: float, measured: bool):
+        super().__init__(name)
+        self.confidence = confidence
+        self.measured_confidence = measured
+        self.calls = 0
+
+    def is_available(self) -> bool:
+        return True
+
+    async def process(self, image: Image.Image) -> OCRResult:
+        self.calls += 1
+        return OCRResult(f"{self.name} text", self.confidence, self.name)
+
+
+class FixedClassifier:
+    def __init__(self, doc_type: DocumentType):
+        self.doc_type = doc_type
+
+    async def classify(self, image: Image.Image) -> DocumentType:
+        return self.doc_type
+
+
+def _route(first: FakeEngine, second: FakeEngine) -> OCRResult:
+    router = OCRRouter()
+    router.classifier = FixedClassifier(DocumentType.SCREENSHOT)
+    router._routing = {DocumentType.SCREENSHOT: (first, second)}
+    return asyncio.run(router.route_and_process(Image.new("L", (64, 64), 255)))
+
+
+def test_measured_confidence_short_circuits():
+    tesseract = FakeEngine("tesseract", 0.95, measured=True)
+    vision = FakeEngine("vision_local", 0.9, measured=False)
+    result = _route(tesseract, vision)
+    assert result.metadata["short_circuited"] is True
+    assert (tesseract.calls, vision.calls) == (1, 0)
+
+
+def test_low_measured_confidence_runs_second_engine():
+    tesseract = FakeEngine("tesseract", 0.5, measured=True)
+    vision = FakeEngine("vision_local", 0.9, measured=False)
+    result = _route(tesseract, vision)
+    assert result.metadata["short_circuited"] is False
+    assert (tesseract.calls, vision.calls) == (1, 1)
+    assert result.engine_name == "vision_local"
+
+
+def test_heuristic_confidence_never_short_circuits():
+    # The vision engine's 0.9 for any longer reply equals the default threshold
+    vision = FakeEngine("vision_local", settings.router_short_circuit_threshold, measured=False)
+    tesseract = FakeEngine("tesseract", 0.5, measured=True)
+    result = _route(vision, tesseract)
+    assert result.metadata["short_circuited"] is False
+    assert (vision.calls, tesseract.calls) == (1, 1)
+
+
+if __name__ == "__main__":
+    test_measured_confidence_short_circuits()
+    test_low_measured_confidence_runs_second_engine()
+    test_heuristic_confidence_never_short_circuits()
+    print("✅ Router short-circuit OK")
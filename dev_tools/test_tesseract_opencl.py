@@ -0,0 +1,50 @@
+"""
+Check TesseractEngine preprocessing on the OpenCL (cv2.UMat) path.
+
+cv2.UMat works without an OpenCL device (OpenCV falls back to the CPU), so
+this runs anywhere; it forces USE_OPENCL on and compares against the numpy
+path. Runs under pytest or directly: python dev_tools/test_tesseract_opencl.py
+"""
+import sys
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import numpy as np
+from PIL import Image
+
+from ocr_pipeline.engines import tesseract_engine
+from ocr_pipeline.engines.tesseract_engine import TesseractEngine
+
+
+def _pages():
+    """A contrasty page (Otsu branch) and a flat one (adaptive branch)."""
+    rng = np.random.default_rng(0)
+    contrasty = np.full((300, 400), 255, np.uint8)
+    contrasty[100:140, 50:350] = 0
+    flat = (128 + rng.integers(-6, 6, (300, 400))).astype(np.uint8)
+    return [Image.fromarray(contrasty), Image.fromarray(flat).convert("RGB")]
+
+
+def _preprocess(img: Image.Image, use_opencl: bool) -> Image.Image:
+    saved = tesseract_engine.USE_OPENCL
+    tesseract_engine.USE_OPENCL = use_opencl
+    try:
+        return TesseractEngine()._preprocess(img)
+    finally:
+        tesseract_engine.USE_OPENCL = saved
+
+
+def test_preprocess_opencl_matches_numpy_path():
+    for page in _pages():
+        on_device = _preprocess(page, use_opencl=True)
+        on_cpu = _preprocess(page, use_opencl=False)
+        assert isinstance(on_device, Image.Image)
+        assert on_device.mode == on_cpu.mode == "L"
+        assert on_device.size == on_cpu.size == page.size
+
+
+if __name__ == "__main__":
+    test_preprocess_opencl_matches_numpy_path()
+    print("✅ OpenCL preprocessing OK")
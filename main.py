@@ -4,30 +4,74 @@ Runs both the OCR API and the dashboard.
 """
 import uvicorn
 import asyncio
-from multiprocessing import Process
+import multiprocessing
 from config import settings
 
+try:
+    import uvloop
+    UVLOOP_AVAILABLE = True
+except ImportError:  # Not installed, or Windows
+    UVLOOP_AVAILABLE = False
 
-def run_api():
-    """Run the OCR API server."""
-    uvicorn.run(
-        "app:app",
-        host="0.0.0.0",
-        port=settings.api_port,
-        reload=False,
-        log_level="info"
-    )
+
+async def serve_all():
+    """
+    Serve the OCR API and the dashboard from one process and event loop.
+    
+    Both apps are async, so a second interpreter would only duplicate the
+    heavy imports (torch, surya, OpenCV) and the HTTP client pools.
+    """
+    from app import app
+    from dashboard.api import dashboard_app
+    
+    servers = [
+        uvicorn.Server(uvicorn.Config(
+            app, host="0.0.0.0", port=settings.api_port, log_level="info"
+        )),
+        uvicorn.Server(uvicorn.Config(
+            dashboard_app, host="0.0.0.0", port=settings.dashboard_port, log_level="info"
+        )),
+    ]
+    # uvicorn chains signal handlers, so Ctrl+C stops both servers
+    await asyncio.gather(*(server.serve() for server in servers))
+
+
+def run_single_process():
+    """
+    Run serve_all on uvloop when it is installed, as uvicorn.run would.
+    
+    asyncio.run() skips uvicorn's own loop setup, so without this the
+    single-process server always ran on the default asyncio loop.
+    """
+    if not UVLOOP_AVAILABLE:
+        asyncio.run(serve_all())
+        return
+    with asyncio.Runner(loop_factory=uvloop.new_event_loop) as runner:
+        runner.run(serve_all())
 
 
-def run_dashboard():
-    """Run the dashboard server."""
-    uvicorn.run(
-        "dashboard.api:dashboard_app",
-        host="0.0.0.0",
-        port=settings.dashboard_port,
-        reload=False,
-        log_level="info"
-    )
+def _serve_dashboard():
+    uvicorn.run("dashboard.api:dashboard_app", host="0.0.0.0",
+                port=settings.dashboard_port, log_level="info")
+
+
+def serve_workers(workers: int):
+    """
+    Serve the OCR API from several worker processes.
+    
+    Each worker loads its own models and caches, so this only pays off when
+    there are cores (and memory) to spare. The dashboard keeps a single
+    process: its WebSocket connections live in that process's memory.
+    """
+    dashboard = multiprocessing.Process(target=_serve_dashboard, daemon=True)
+    dashboard.start()
+    try:
+        # uvicorn picks uvloop/httptools when uvicorn[standard] is installed
+        uvicorn.run("app:app", host="0.0.0.0", port=settings.api_port,
+                    workers=workers, log_level="info")
+    finally:
+        dashboard.terminate()
+        dashboard.join()
 
 
 if __name__ == "__main__":
@@ -40,21 +84,11 @@ if __name__ == "__main__":
     print("=" * 60)
     print()
     
-    # Start both servers in separate processes
-    api_process = Process(target=run_api)
-    dashboard_process = Process(target=run_dashboard)
-    
     try:
-        api_process.start()
-        dashboard_process.start()
-        
-        api_process.join()
-        dashboard_process.join()
+        if settings.api_workers > 1:
+            serve_workers(settings.api_workers)
+        else:
+            run_single_process()
     except KeyboardInterrupt:
-        print("\n⏹️  Shutting down...")
-        api_process.terminate()
-        dashboard_process.terminate()
-        api_process.join()
-        dashboard_process.join()
-        print("✅ Shutdown complete")
-
+        pass
+    print("✅ Shutdown complete")
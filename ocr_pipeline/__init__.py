@@ -1,2 +1,18 @@
 """OCR Pipeline package."""
+import logging
 
+
+def configure_logging(level: str = "INFO"):
+    """
+    Send this package's progress messages to stderr, one plain line each.
+    
+    Only the ocr_pipeline logger is touched, so libraries that log through
+    the root logger (httpx request lines, etc.) stay quiet. Safe to call
+    more than once.
+    """
+    log = logging.getLogger(__name__)
+    if not log.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        log.addHandler(handler)
+    log.setLevel(level.upper())
@@ -0,0 +1,67 @@
+"""Micro-batching of concurrent inference requests."""
+import asyncio
+from typing import Any, Awaitable, Callable, List, Optional
+
+
+class AsyncBatchQueue:
+    """
+    Collects items submitted by concurrent callers and processes them together.
+
+    The first item opens a batch; the batch is dispatched once it holds
+    max_batch_size items or max_wait_time seconds have passed, whichever
+    comes first. process_fn receives the list of items and must return one
+    result per item, in order.
+    """
+
+    def __init__(
+        self,
+        process_fn: Callable[[List[Any]], Awaitable[List[Any]]],
+        max_batch_size: int = 8,
+        max_wait_time: float = 0.05
+    ):
+        self.process_fn = process_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait_time = max_wait_time
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+
+    async def add_request(self, item: Any) -> Any:
+        """Queue one item and wait for its result."""
+        # Started lazily so the queue binds to the loop that is actually running
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._run())
+        fut = asyncio.get_running_loop().create_future()
+        await self._queue.put((item, fut))
+        return await fut
+
+    async def _collect(self) -> list:
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait_time
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            # Drop callers that gave up while the batch was filling
+            batch = [(item, fut) for item, fut in await self._collect() if not fut.done()]
+            if not batch:
+                continue
+            try:
+                results = await self.process_fn([item for item, _ in batch])
+            except Exception as e:
+                for _, fut in batch:
+                    if not fut.done():
+                        fut.set_exception(e)
+                continue
+            for (_, fut), result in zip(batch, results):
+                if not fut.done():
+                    fut.set_result(result)
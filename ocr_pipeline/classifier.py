@@ -1,11 +1,35 @@
 """Document type classifier for intelligent routing."""
 import io
+import os
+import re
 import base64
-import httpx
+import asyncio
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from enum import Enum
+from typing import Optional
 from PIL import Image
+import cv2
 import numpy as np
 from config import settings
+from .http import JSON_HEADERS, _json_dumps, _json_loads, get_ollama_client
+from .imaging import downscale
+
+try:
+    import onnxruntime as ort
+    ONNXRUNTIME_AVAILABLE = True
+except ImportError:
+    ONNXRUNTIME_AVAILABLE = False
+
+
+BLUR_CHECK_SIZE = 1024  # Long side used for the blur check
+TEXTURE_STD_MIN = 40.0  # 64x64 thumbnail std above which the blur check is skipped
+CLASSIFY_IMAGE_SIZE = 800  # Long side of the image sent to the vision model
+CLASSIFY_CACHE_SIZE = 1024  # Vision verdicts remembered by perceptual hash
+CNN_INPUT_SIZE = 224  # Square input expected by the ONNX classifier
+# ImageNet statistics, as used when fine-tuning MobileNet-style backbones
+CNN_MEAN = np.array([0.485, 0.456, 0.406], dtype=np.float32) * 255.0
+CNN_STD = np.array([0.229, 0.224, 0.225], dtype=np.float32) * 255.0
 
 
 class DocumentType(Enum):
@@ -18,6 +42,59 @@ class DocumentType(Enum):
     LOW_QUALITY = "low_quality"
 
 
+# Labels the vision model may answer with; LOW_QUALITY comes from heuristics
+VISION_LABELS = {t.value: t for t in DocumentType if t is not DocumentType.LOW_QUALITY}
+# Ollama structured output: decoding is constrained to one of the labels, so
+# the model emits a few tokens and the reply parses without guesswork
+CLASSIFY_FORMAT = {
+    "type": "object",
+    "properties": {"category": {"type": "string", "enum": list(VISION_LABELS)}},
+    "required": ["category"]
+}
+CLASSIFY_PROMPT = """Analyze this document image and classify it into ONE of these categories:
+1. printed_text - Clean, machine-printed text (books, documents, PDFs)
+2. handwriting - Handwritten notes or text
+3. mixed - Contains both printed text and handwriting
+4. screenshot - Screenshot of digital content (websites, apps)
+5. table_heavy - Document with significant tables or structured data
+
+Respond with JSON: {"category": "<category name>"}"""
+
+# Free-text fallback when the server ignores the JSON format: one scan,
+# first category mentioned wins
+CATEGORY_RE = re.compile(r'print|handwrit|mixed|screen|table')
+CATEGORY_STEMS = {
+    "print": DocumentType.PRINTED_TEXT,
+    "handwrit": DocumentType.HANDWRITING,
+    "mixed": DocumentType.MIXED,
+    "screen": DocumentType.SCREENSHOT,
+    "table": DocumentType.TABLE_HEAVY,
+}
+# Output order of the ONNX classifier's logits
+CNN_LABELS = list(VISION_LABELS.values())
+
+# Image conversion, blur check, hashing and encoding run here instead of on
+# the event loop; the small cap bounds PIL memory under bursts of uploads
+_cpu_pool = ThreadPoolExecutor(max_workers=min(4, os.cpu_count() or 1), thread_name_prefix="classify")
+
+
+async def _run_cpu(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(_cpu_pool, fn, *args)
+
+
+# Perceptual hash -> vision verdict, so re-sent or near-identical pages skip
+# the model call. Only touched from the event loop, so no lock is needed
+_classify_cache: "OrderedDict[int, DocumentType]" = OrderedDict()
+
+
+def _phash(image: Image.Image) -> int:
+    """64-bit perceptual hash: low-frequency DCT terms vs. their median."""
+    small = image.resize((32, 32), Image.Resampling.BILINEAR, reducing_gap=2.0).convert("L")
+    low = cv2.dct(np.asarray(small, dtype=np.float32))[:8, :8]
+    bits = (low > np.median(low)).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
 class DocumentClassifier:
     """Classifies document type for optimal OCR routing."""
     
@@ -25,98 +102,157 @@ class DocumentClassifier:
         self.vision_provider = settings.vision_provider
         self.vision_model = settings.vision_model
         self.ollama_host = settings.ollama_host
+        # Everything but the image is the same on every call
+        self._payload_base = {
+            "model": self.vision_model,
+            "prompt": CLASSIFY_PROMPT,
+            "stream": False,
+            "format": CLASSIFY_FORMAT,
+            "options": {
+                "temperature": 0.1,
+                "num_ctx": 2048,
+                "num_predict": 16
+            }
+        }
+        self.cnn_min_confidence = settings.classifier_min_confidence
+        self._session = self._load_cnn(settings.classifier_onnx_path)
+    
+    @staticmethod
+    def _load_cnn(path: str):
+        """Open the local ONNX classifier, or None if none is configured."""
+        if not (ONNXRUNTIME_AVAILABLE and path and os.path.isfile(path)):
+            return None
+        try:
+            opts = ort.SessionOptions()
+            opts.intra_op_num_threads = min(4, os.cpu_count() or 1)
+            return ort.InferenceSession(path, sess_options=opts, providers=["CPUExecutionProvider"])
+        except Exception as e:
+            print(f"Warning: Failed to load classifier model {path}: {e}")
+            return None
     
     async def classify(self, image: Image.Image) -> DocumentType:
         """
         Classify the document type.
         
-        For now, uses vision model for classification.
-        TODO: Add lightweight CNN classifier for faster classification.
+        A local ONNX classifier (if configured) answers confident cases on the
+        CPU; the vision model is only asked when it is unsure or absent.
         """
         # Quick heuristic checks first
-        if self._is_low_quality(image):
+        key = await _run_cpu(self._prescreen, image)
+        if key is None:
             return DocumentType.LOW_QUALITY
         
+        # Same page seen recently: reuse the verdict instead of a model call
+        cached = _classify_cache.get(key)
+        if cached is not None:
+            _classify_cache.move_to_end(key)
+            return cached
+        
+        doc_type = None
+        if self._session is not None:
+            doc_type = await _run_cpu(self._classify_with_cnn, image)
+        
         # Use vision model for classification
-        doc_type = await self._classify_with_vision(image)
+        if doc_type is None:
+            doc_type = await self._classify_with_vision(image)
+        if doc_type is None:
+            # Not cached, so the next request retries the model
+            return DocumentType.PRINTED_TEXT
+        
+        _classify_cache[key] = doc_type
+        while len(_classify_cache) > CLASSIFY_CACHE_SIZE:
+            _classify_cache.popitem(last=False)
         return doc_type
     
+    def _prescreen(self, image: Image.Image) -> Optional[int]:
+        """Perceptual hash of the page, or None if it is too poor to classify."""
+        return None if self._is_low_quality(image) else _phash(image)
+    
     def _is_low_quality(self, image: Image.Image) -> bool:
         """Quick check for low quality images."""
         # Check if image is very small
         if image.width < 100 or image.height < 100:
             return True
         
-        # Check if image is very blurry (using variance of Laplacian)
-        arr = np.array(image.convert('L'))
-        laplacian = np.array([[0, 1, 0], [1, -4, 1], [0, 1, 0]])
-        variance = np.var(np.abs(np.convolve(arr.flatten(), laplacian.flatten(), mode='same')))
+        arr = np.asarray(image if image.mode == "L" else image.convert("L"), dtype=np.uint8)
+        
+        # Strong contrast survives even a 64x64 thumbnail; such pages have
+        # real content and are not worth a full blur measurement
+        small = cv2.resize(arr, (64, 64), interpolation=cv2.INTER_AREA)
+        if small.std() > TEXTURE_STD_MIN:
+            return False
+        
+        # Check if image is very blurry (using variance of Laplacian).
+        # Blur shows at any scale, so measure on a bounded-size copy
+        long_side = max(arr.shape)
+        if long_side > BLUR_CHECK_SIZE:
+            scale = BLUR_CHECK_SIZE / long_side
+            arr = cv2.resize(arr, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        variance = cv2.Laplacian(arr, cv2.CV_64F).var()
         
         if variance < 100:  # Arbitrary threshold for blur
             return True
         
         return False
     
+    def _classify_with_cnn(self, image: Image.Image) -> Optional[DocumentType]:
+        """Run the ONNX classifier (None if its top score is below the threshold)."""
+        try:
+            arr = np.asarray(image if image.mode == "RGB" else image.convert("RGB"))
+            arr = cv2.resize(arr, (CNN_INPUT_SIZE, CNN_INPUT_SIZE), interpolation=cv2.INTER_AREA)
+            x = ((arr.astype(np.float32) - CNN_MEAN) / CNN_STD).transpose(2, 0, 1)[None]
+            inp = self._session.get_inputs()[0].name
+            logits = self._session.run(None, {inp: x})[0][0].astype(np.float64)
+        except Exception as e:
+            print(f"CNN classification error: {e}, asking the vision model")
+            return None
+        probs = np.exp(logits - logits.max())
+        probs /= probs.sum()
+        best = int(probs.argmax())
+        if probs[best] < self.cnn_min_confidence or best >= len(CNN_LABELS):
+            return None
+        return CNN_LABELS[best]
+    
     def _image_to_base64(self, image: Image.Image) -> str:
         """Convert PIL Image to base64."""
         buffered = io.BytesIO()
         # Resize for faster classification
-        img_small = image.copy()
-        img_small.thumbnail((800, 800))
-        img_small.save(buffered, format="PNG")
-        return base64.b64encode(buffered.getvalue()).decode()
+        img_small = downscale(image, CLASSIFY_IMAGE_SIZE)
+        if img_small.mode != "RGB":
+            img_small = img_small.convert("RGB")
+        # JPEG encodes much faster than PNG and is several times smaller to ship
+        img_small.save(buffered, format="JPEG", quality=85)
+        return base64.b64encode(buffered.getbuffer()).decode("ascii")
     
-    async def _classify_with_vision(self, image: Image.Image) -> DocumentType:
-        """Use vision model to classify document type."""
-        img_b64 = self._image_to_base64(image)
-        
-        prompt = """Analyze this document image and classify it into ONE of these categories:
-1. printed_text - Clean, machine-printed text (books, documents, PDFs)
-2. handwriting - Handwritten notes or text
-3. mixed - Contains both printed text and handwriting
-4. screenshot - Screenshot of digital content (websites, apps)
-5. table_heavy - Document with significant tables or structured data
-
-Respond with ONLY the category name, nothing else."""
+    async def _classify_with_vision(self, image: Image.Image) -> Optional[DocumentType]:
+        """Use vision model to classify document type (None if the call failed)."""
+        img_b64 = await _run_cpu(self._image_to_base64, image)
         
-        payload = {
-            "model": self.vision_model,
-            "prompt": prompt,
-            "images": [img_b64],
-            "stream": False,
-            "options": {
-                "temperature": 0.1,
-                "num_ctx": 2048
-            }
-        }
+        body = _json_dumps({**self._payload_base, "images": [img_b64]})
         
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(
-                    f"{self.ollama_host}/api/generate",
-                    json=payload
-                )
-                response.raise_for_status()
-                data = response.json()
+            response = await get_ollama_client().post(
+                "/api/generate", content=body, headers=JSON_HEADERS, timeout=30.0
+            )
+            response.raise_for_status()
+            data = response.json()
+            
+            result = data.get("response", "").strip()
+            try:
+                result = _json_loads(result).get("category", "")
+            except (ValueError, AttributeError):
+                pass  # Server ignored the format; parse the free text below
+            result = result.lower()
             
-            result = data.get("response", "").strip().lower()
+            doc_type = VISION_LABELS.get(result)
+            if doc_type is not None:
+                return doc_type
             
-            # Parse result
-            if "printed" in result or "print" in result:
-                return DocumentType.PRINTED_TEXT
-            elif "handwrit" in result:
-                return DocumentType.HANDWRITING
-            elif "mixed" in result:
-                return DocumentType.MIXED
-            elif "screenshot" in result or "screen" in result:
-                return DocumentType.SCREENSHOT
-            elif "table" in result:
-                return DocumentType.TABLE_HEAVY
-            else:
-                # Default to printed text
-                return DocumentType.PRINTED_TEXT
+            # Parse result (default to printed text)
+            m = CATEGORY_RE.search(result)
+            return CATEGORY_STEMS[m.group()] if m else DocumentType.PRINTED_TEXT
                 
         except Exception as e:
             print(f"Classification error: {e}, defaulting to PRINTED_TEXT")
-            return DocumentType.PRINTED_TEXT
+            return None
 
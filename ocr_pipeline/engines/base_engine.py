@@ -1,6 +1,6 @@
 """Base OCR Engine interface."""
 from abc import ABC, abstractmethod
-from typing import Tuple, Dict, Any
+from typing import Tuple, Dict, Any, List
 from PIL import Image
 
 
@@ -23,9 +23,36 @@ class OCRResult:
         return f"OCRResult(engine={self.engine_name}, confidence={self.confidence:.2f}, chars={len(self.text)})"
 
 
+def expand_duplicates(results: List["OCRResult"], slots: List[int]) -> List["OCRResult"]:
+    """
+    Map results for distinct pages back onto every input page (see
+    imaging.unique_pages). Repeats get their own OCRResult, tagged with the
+    page they were copied from.
+    """
+    first_page: Dict[int, int] = {}
+    out = []
+    for page, slot in enumerate(slots):
+        result = results[slot]
+        if slot in first_page:
+            result = OCRResult(
+                text=result.text,
+                confidence=result.confidence,
+                engine_name=result.engine_name,
+                metadata={**result.metadata, "deduped_from": first_page[slot]}
+            )
+        else:
+            first_page[slot] = page
+        out.append(result)
+    return out
+
+
 class BaseOCREngine(ABC):
     """Abstract base class for OCR engines."""
     
+    # True when OCRResult.confidence comes from the recogniser itself rather
+    # than a fixed heuristic; only measured scores may skip a second opinion
+    measured_confidence = False
+    
     def __init__(self, name: str):
         self.name = name
     
@@ -3,11 +3,19 @@ Gemini Vision Engine - Uses Google's Gemini 2.5 Pro for multimodal vision tasks.
 """
 import base64
 import io
-from typing import Optional
+import asyncio
+from typing import List, Optional
 from PIL import Image
 import google.generativeai as genai
 from config import settings
-from .base_engine import BaseOCREngine, OCRResult
+from .base_engine import BaseOCREngine, OCRResult, expand_duplicates
+from ..response_cache import get_response_cache, response_key
+from ..imaging import downscale, unique_pages
+
+OCR_PROMPT = """Extract all text from this image accurately. 
+Preserve the layout, structure, and formatting as much as possible.
+If there are tables, format them clearly.
+Return only the extracted text, no commentary."""
 
 
 class GeminiVisionEngine(BaseOCREngine):
@@ -44,10 +52,9 @@ class GeminiVisionEngine(BaseOCREngine):
     
     def _prepare_image(self, image: Image.Image) -> Image.Image:
         """Prepare image for Gemini (resize if needed)."""
-        # Gemini can handle larger images than Ollama
-        if max(image.size) > self.max_image_size[0]:
-            image.thumbnail(self.max_image_size, Image.Resampling.LANCZOS)
-        return image
+        # Gemini can handle larger images than Ollama. Unlike thumbnail(),
+        # this leaves the caller's page untouched
+        return downscale(image, self.max_image_size[0])
     
     async def process(self, image: Image.Image) -> OCRResult:
         """
@@ -58,20 +65,44 @@ class GeminiVisionEngine(BaseOCREngine):
         """
         prepared_image = self._prepare_image(image)
         
-        prompt = """Extract all text from this image accurately. 
-Preserve the layout, structure, and formatting as much as possible.
-If there are tables, format them clearly.
-Return only the extracted text, no commentary."""
-        
-        response = self.model.generate_content([prompt, prepared_image])
+        cache = key = None
+        text = None
+        if settings.vision_cache_enabled:
+            cache = get_response_cache(settings.vision_cache_path)
+            key = response_key(prepared_image, OCR_PROMPT, f"gemini_engine:{self.model_name}")
+            text = await cache.get(key)
+        if text is None:
+            response = await self.model.generate_content_async([OCR_PROMPT, prepared_image])
+            text = response.text
+            if cache is not None:
+                await cache.put(key, text)
         
         return OCRResult(
-            text=response.text,
+            text=text,
             confidence=0.95,  # Gemini is very reliable
             engine_name="gemini-2.0-flash-exp",
             metadata={"model": "gemini-2.0-flash-exp"}
         )
     
+    async def process_batch(self, images: List[Image.Image]) -> List[OCRResult]:
+        """
+        Process several pages (e.g. a multi-page PDF) concurrently.
+        
+        Requests overlap instead of running back to back, capped at
+        settings.gemini_concurrency in flight. Pixel-identical pages (blank
+        separators, repeated inserts) are sent once. Results keep the input
+        order.
+        """
+        limit = asyncio.Semaphore(max(1, settings.gemini_concurrency))
+        
+        async def one(image: Image.Image) -> OCRResult:
+            async with limit:
+                return await self.process(image)
+        
+        uniques, slots = unique_pages(images)
+        results = await asyncio.gather(*(one(image) for image in uniques))
+        return expand_duplicates(list(results), slots)
+    
     async def analyze_document(self, image: Image.Image, prompt: str) -> str:
         """
         Use Gemini for document analysis with custom prompt.
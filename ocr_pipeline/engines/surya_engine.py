@@ -1,7 +1,58 @@
 """Surya OCR Engine - optimized for handwriting."""
-from functools import lru_cache
+import asyncio
+import threading
+from typing import List
 from PIL import Image
-from .base_engine import BaseOCREngine, OCRResult
+from .base_engine import BaseOCREngine, OCRResult, expand_duplicates
+from ..batch_queue import AsyncBatchQueue
+from ..imaging import unique_pages
+
+
+# Process-wide predictors, shared by every engine instance and by app.py so
+# the models are loaded into memory only once
+_foundation = None
+_det = None
+_rec = None
+# Re-entrant: get_rec() builds the foundation predictor under the same lock
+_surya_lock = threading.RLock()
+
+
+def get_foundation():
+    """Lazy load foundation predictor."""
+    global _foundation
+    if _foundation is None:
+        with _surya_lock:
+            if _foundation is None:
+                from surya.foundation import FoundationPredictor
+                _foundation = FoundationPredictor()
+    return _foundation
+
+
+def get_det():
+    """Lazy load detection predictor."""
+    global _det
+    if _det is None:
+        with _surya_lock:
+            if _det is None:
+                from surya.detection import DetectionPredictor
+                _det = DetectionPredictor()
+    return _det
+
+
+def get_rec():
+    """Lazy load recognition predictor."""
+    global _rec
+    if _rec is None:
+        with _surya_lock:
+            if _rec is None:
+                from surya.recognition import RecognitionPredictor
+                _rec = RecognitionPredictor(get_foundation())
+    return _rec
+
+
+def warm_up():
+    """Load the predictors and run one tiny inference so first requests don't pay for it."""
+    get_rec()([Image.new("RGB", (64, 64), "white")], det_predictor=get_det())
 
 
 class SuryaEngine(BaseOCREngine):
@@ -9,27 +60,8 @@ class SuryaEngine(BaseOCREngine):
     
     def __init__(self):
         super().__init__("surya")
-        self._foundation = None
-        self._det = None
-        self._rec = None
-    
-    @lru_cache(maxsize=1)
-    def _get_foundation(self):
-        """Lazy load foundation predictor."""
-        from surya.foundation import FoundationPredictor
-        return FoundationPredictor()
-    
-    @lru_cache(maxsize=1)
-    def _get_det(self):
-        """Lazy load detection predictor."""
-        from surya.detection import DetectionPredictor
-        return DetectionPredictor()
-    
-    @lru_cache(maxsize=1)
-    def _get_rec(self):
-        """Lazy load recognition predictor."""
-        from surya.recognition import RecognitionPredictor
-        return RecognitionPredictor(self._get_foundation())
+        # Concurrent process() calls share one recognition batch
+        self._batcher = AsyncBatchQueue(self._predict_batch, max_batch_size=8, max_wait_time=0.025)
     
     def is_available(self) -> bool:
         """Check if Surya is available."""
@@ -39,25 +71,46 @@ class SuryaEngine(BaseOCREngine):
         except ImportError:
             return False
     
+    def _predict(self, imgs: list) -> list:
+        """Run detection + recognition on a list of RGB images (blocking)."""
+        return get_rec()(imgs, det_predictor=get_det())
+    
+    async def _predict_batch(self, imgs: list) -> list:
+        # Model loading and inference block for seconds; run them in a thread
+        return await asyncio.to_thread(self._predict, imgs)
+    
     async def process(self, image: Image.Image) -> OCRResult:
         """Process image with Surya."""
-        # Convert to RGB
-        img_rgb = image.convert("RGB")
-        
-        # Get predictors
-        rec = self._get_rec()
-        det = self._get_det()
+        # Convert to RGB (convert() copies even when the mode already matches)
+        img_rgb = image if image.mode == "RGB" else image.convert("RGB")
         
         # Run prediction
-        preds = rec([img_rgb], det_predictor=det)[0]
+        preds = await self._batcher.add_request(img_rgb)
+        return self._to_result(preds)
+    
+    async def process_batch(self, images: List[Image.Image]) -> List[OCRResult]:
+        """
+        Process several pages in one predictor call.
         
+        For callers that already hold all pages (e.g. a multi-page PDF):
+        detection and recognition batch them together instead of waiting
+        on the micro-batcher's window. Pixel-identical pages are recognised
+        once.
+        """
+        if not images:
+            return []
+        uniques, slots = unique_pages(images)
+        preds = await self._predict_batch(
+            [image if image.mode == "RGB" else image.convert("RGB") for image in uniques]
+        )
+        return expand_duplicates([self._to_result(p) for p in preds], slots)
+    
+    def _to_result(self, preds) -> OCRResult:
+        """Build an OCRResult from one page's Surya prediction."""
         # Extract text lines
-        lines = []
-        if hasattr(preds, "text_lines"):
-            for ln in getattr(preds, "text_lines", []):
-                text = getattr(ln, "text", "") or ""
-                if text:
-                    lines.append(text)
+        lines = [
+            t for ln in getattr(preds, "text_lines", ()) if (t := getattr(ln, "text", None))
+        ]
         
         text = "\n".join(lines)
         
@@ -1,17 +1,136 @@
 """Tesseract OCR Engine - optimized for printed text."""
 import io
+import os
+import asyncio
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from collections import defaultdict
+from typing import Dict, List, Tuple, Union
 import cv2
 import numpy as np
 import pytesseract
 from PIL import Image, ImageOps
+from config import settings
 from .base_engine import BaseOCREngine, OCRResult
 
 
+PSM_MODES = ("6", "4", "11")
+MORPH_KERNEL = np.ones((2, 2), np.uint8)
+EXIF_ORIENTATION = 0x0112
+# Opt-in: the upload/download to the device only pays off when the filter
+# work is large relative to it (a GPU/iGPU, full-size pages)
+USE_OPENCL = settings.opencv_opencl and cv2.ocl.haveOpenCL()
+VOTE_MIN_IOU = 0.5  # Box overlap for a word from another PSM to count as the same word
+VOTE_CELL = 32  # Row height (px) of the grid used to find overlapping boxes
+
+
+def _words(data: Dict) -> List[Tuple[str, float, Tuple[int, int, int, int], Tuple[int, int, int]]]:
+    """Recognised words from an image_to_data dict: (text, conf, box, line key)."""
+    # Parse the confidence column in one go and only visit real words
+    # (tesseract marks page/block/line rows with -1)
+    confs = np.asarray(data["conf"], dtype=np.float64)
+    text, left, top = data["text"], data["left"], data["top"]
+    width, height = data["width"], data["height"]
+    block, par, line = data["block_num"], data["par_num"], data["line_num"]
+    out = []
+    for i in np.flatnonzero(confs >= 0).tolist():
+        word = text[i]
+        if not word or not word.strip():
+            continue
+        out.append((
+            word, float(confs[i]),
+            (left[i], top[i], left[i] + width[i], top[i] + height[i]),
+            (block[i], par[i], line[i])
+        ))
+    return out
+
+
+def _iou(a: Tuple[int, int, int, int], b: Tuple[int, int, int, int]) -> float:
+    ix = min(a[2], b[2]) - max(a[0], b[0])
+    iy = min(a[3], b[3]) - max(a[1], b[1])
+    if ix <= 0 or iy <= 0:
+        return 0.0
+    inter = ix * iy
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def _layout_text(words: List[Tuple[str, Tuple[int, int, int]]]) -> str:
+    """Words joined per line, a blank line between paragraphs (image_to_string layout)."""
+    lines, current, cur_line, cur_par = [], [], None, None
+    for text, key in words:
+        if key != cur_line:
+            if current:
+                lines.append(" ".join(current))
+                current = []
+            if cur_par is not None and key[:2] != cur_par:
+                lines.append("")
+            cur_line, cur_par = key, key[:2]
+        current.append(text)
+    if current:
+        lines.append(" ".join(current))
+    return "\n".join(lines)
+
+
+def _vote(master: Dict, others: List[Dict]) -> Tuple[str, float]:
+    """
+    Confidence-weighted word voting across PSM runs.
+    
+    The master run fixes the layout. Each of its words is replaced by the
+    surface form with the highest summed confidence among itself and the
+    overlapping (IoU >= VOTE_MIN_IOU) words of the other runs. Returns the
+    text and the mean confidence of the winning forms.
+    """
+    grids = []
+    for data in others:
+        grid = defaultdict(list)
+        for text, conf, box, _ in _words(data):
+            for row in range(box[1] // VOTE_CELL, box[3] // VOTE_CELL + 1):
+                grid[row].append((text, conf, box))
+        grids.append(grid)
+    
+    chosen, confs = [], []
+    for text, conf, box, key in _words(master):
+        votes = defaultdict(float)
+        best = defaultdict(float)
+        votes[text] += conf
+        best[text] = conf
+        for grid in grids:
+            # Best-overlapping word of this run; a run votes at most once
+            match, match_iou = None, VOTE_MIN_IOU
+            seen = set()
+            for row in range(box[1] // VOTE_CELL, box[3] // VOTE_CELL + 1):
+                for cand in grid.get(row, ()):
+                    if id(cand) in seen:
+                        continue
+                    seen.add(id(cand))
+                    iou = _iou(box, cand[2])
+                    if iou >= match_iou:
+                        match, match_iou = cand, iou
+            if match is not None:
+                votes[match[0]] += match[1]
+                best[match[0]] = max(best[match[0]], match[1])
+        # max() keeps the first key on ties, i.e. the master's own word
+        winner = max(votes, key=votes.__getitem__)
+        chosen.append((winner, key))
+        confs.append(best[winner])
+    
+    conf = sum(confs) / len(confs) if confs else 0.0
+    return _layout_text(chosen), conf
+
+
 class TesseractEngine(BaseOCREngine):
     """Tesseract engine with advanced preprocessing."""
     
+    measured_confidence = True  # Mean per-word LSTM confidence
+    
     def __init__(self):
         super().__init__("tesseract")
+        # One worker per PSM; each call is a tesseract subprocess, so the
+        # threads run in parallel across cores
+        self._pool = ThreadPoolExecutor(
+            max_workers=len(PSM_MODES), thread_name_prefix="tesseract-engine"
+        )
     
     def is_available(self) -> bool:
         """Check if Tesseract is available."""
@@ -23,18 +142,34 @@ class TesseractEngine(BaseOCREngine):
     
     def _preprocess(self, img: Image.Image) -> Image.Image:
         """Apply OpenCV preprocessing for better OCR."""
-        img = ImageOps.exif_transpose(img)
-        w, h = img.size
+        # exif_transpose copies the whole image even when there is nothing
+        # to rotate, so only call it for pages that carry an orientation
+        if img.getexif().get(EXIF_ORIENTATION, 1) != 1:
+            img = ImageOps.exif_transpose(img)
+        # Go to single-channel uint8 once and stay in OpenCV from here on
+        gray = np.asarray(img if img.mode == "L" else img.convert("L"))
+        h, w = gray.shape
         long_side = max(w, h)
         if long_side > 2200:
             scale = 2200 / long_side
-            img = img.resize((int(w * scale), int(h * scale)))
+            gray = cv2.resize(
+                gray, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA
+            )
+        
+        # With OpenCL the same calls run on the device via cv2.UMat
+        if USE_OPENCL:
+            gray = cv2.UMat(gray)
         
-        arr = np.array(img)
-        gray = arr if arr.ndim == 2 else cv2.cvtColor(arr, cv2.COLOR_RGB2GRAY)
-        gray = cv2.bilateralFilter(gray, d=7, sigmaColor=40, sigmaSpace=40)
+        # A 3x3 median removes scanner speckle while keeping stroke edges, at
+        # a fraction of the bilateral filter's per-pixel cost
+        gray = cv2.medianBlur(gray, 3)
         
-        std = float(gray.std())
+        if USE_OPENCL:
+            # UMat in, UMat out: fetch the 1x1 stddev before indexing it
+            std = float(cv2.meanStdDev(gray)[1].get()[0, 0])
+        else:
+            # Every 4th pixel each way is plenty to tell flat from contrasty pages
+            std = float(gray[::4, ::4].std())
         if std >= 32.0:
             _, th = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
         else:
@@ -43,40 +178,59 @@ class TesseractEngine(BaseOCREngine):
                 cv2.THRESH_BINARY, 35, 15
             )
         
-        th = cv2.morphologyEx(th, cv2.MORPH_OPEN, np.ones((2, 2), np.uint8))
+        if USE_OPENCL:
+            th = cv2.morphologyEx(th, cv2.MORPH_OPEN, MORPH_KERNEL).get()
+        else:
+            cv2.morphologyEx(th, cv2.MORPH_OPEN, MORPH_KERNEL, dst=th)
         return Image.fromarray(th)
     
-    def _get_text(self, img: Image.Image, psm: str) -> str:
-        """Extract text with specific PSM mode."""
+    def _get_data(self, img: Union[Image.Image, str], psm: str) -> Dict:
+        """Run one PSM pass and return tesseract's word-level data."""
         cfg = f"--oem 1 --psm {psm} -l eng --dpi 300 -c preserve_interword_spaces=1"
-        return pytesseract.image_to_string(img, config=cfg)
-    
-    def _get_confidence(self, img: Image.Image, psm: str) -> float:
-        """Get average confidence score."""
-        cfg = f"--oem 1 --psm {psm} -l eng --dpi 300"
-        data = pytesseract.image_to_data(
+        return pytesseract.image_to_data(
             img, config=cfg, output_type=pytesseract.Output.DICT
         )
-        confs = [int(c) for c in data.get("conf", []) if c not in ("-1", -1)]
-        return float(sum(confs) / len(confs)) if confs else 0.0
     
     async def process(self, image: Image.Image) -> OCRResult:
         """Process image with Tesseract."""
+        # Preprocessing and tesseract are blocking; keep them off the event loop
+        return await asyncio.to_thread(self._process_sync, image)
+    
+    def _process_sync(self, image: Image.Image) -> OCRResult:
+        """Blocking body of process()."""
         # Preprocess
         processed = self._preprocess(image)
         
-        # Try multiple PSM modes and pick best
-        best_text, best_conf = "", 0.0
-        for psm in ("6", "4", "11"):
-            text = self._get_text(processed, psm=psm).strip()
-            conf = self._get_confidence(processed, psm=psm)
-            if conf > best_conf and text:
-                best_text, best_conf = text, conf
+        # pytesseract writes a PIL image to a temp PNG on every call; saving
+        # the page once and passing the path shares that across the PSM runs
+        # (a light compression level keeps the one write cheap)
+        fd, path = tempfile.mkstemp(prefix="tess_", suffix=".png")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                processed.save(f, format="PNG", compress_level=1)
+            # Run the PSM modes concurrently
+            runs = list(self._pool.map(lambda psm: self._get_data(path, psm), PSM_MODES))
+        finally:
+            os.unlink(path)
+        
+        # The first mode's layout is the master; the others vote on its words
+        best_text, best_conf = _vote(runs[0], runs[1:])
+        best_text = best_text.strip()
+        if not best_text:
+            # Master pass found nothing: fall back to the best single pass
+            for run in runs[1:]:
+                words = _words(run)
+                if not words:
+                    continue
+                conf = sum(w[1] for w in words) / len(words)
+                if conf > best_conf:
+                    best_text = _layout_text([(w[0], w[3]) for w in words]).strip()
+                    best_conf = conf
         
         return OCRResult(
             text=best_text,
             confidence=best_conf / 100.0,  # Normalize to 0-1
             engine_name=self.name,
-            metadata={"psm_modes_tested": ["6", "4", "11"]}
+            metadata={"psm_modes_tested": list(PSM_MODES), "psm_vote_master": PSM_MODES[0]}
         )
 
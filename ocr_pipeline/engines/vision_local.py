@@ -1,10 +1,13 @@
 """Local Vision Model Engine via Ollama."""
 import io
 import base64
-import httpx
 from PIL import Image
 from config import settings
 from .base_engine import BaseOCREngine, OCRResult
+from ..http import ollama_generate
+from ..imaging import downscale
+
+VISION_IMAGE_SIZE = 2048  # Long side of the page sent to the model
 
 
 class VisionLocalEngine(BaseOCREngine):
@@ -31,8 +34,13 @@ class VisionLocalEngine(BaseOCREngine):
     def _image_to_base64(self, image: Image.Image) -> str:
         """Convert PIL Image to base64 string."""
         buffered = io.BytesIO()
-        image.save(buffered, format="PNG")
-        return base64.b64encode(buffered.getvalue()).decode()
+        # JPEG is several times smaller than PNG for scanned/photographed
+        # pages, which shrinks the upload and the image the model decodes
+        image = downscale(image, VISION_IMAGE_SIZE)
+        if image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        image.save(buffered, format="JPEG", quality=85)
+        return base64.b64encode(buffered.getbuffer()).decode("ascii")
     
     async def process(self, image: Image.Image) -> OCRResult:
         """Process image with Ollama vision model."""
@@ -50,20 +58,13 @@ Output ONLY the extracted text, no commentary."""
             "model": self.model_name,
             "prompt": prompt,
             "images": [img_b64],
-            "stream": False,
             "options": {
                 "temperature": 0.1,
                 "num_ctx": 4096
             }
         }
         
-        async with httpx.AsyncClient(timeout=120.0) as client:
-            response = await client.post(
-                f"{self.ollama_host}/api/generate",
-                json=payload
-            )
-            response.raise_for_status()
-            data = response.json()
+        data = await ollama_generate(payload)
         
         text = data.get("response", "").strip()
         
@@ -9,23 +9,73 @@ Supports multiple AI providers with a unified interface:
 - OpenRouter (Proxy to multiple providers)
 """
 from abc import ABC, abstractmethod
-from typing import Optional
+from typing import List, Optional, Union
 from PIL import Image
+import asyncio
 import base64
+import importlib.util
 import io
 import httpx
 from config import settings
+from ..http import get_api_client, ollama_generate
+from ..response_cache import get_response_cache, response_key
+from ..imaging import IdentityCache, downscale
+
+RETRY_ATTEMPTS = 3  # Total tries per image in analyze_many
+RETRY_BASE_DELAY = 0.5  # Seconds; doubled after each failed try
+ENCODE_CACHE_SIZE = 4  # Recent encodings kept; each format/grayscale/size variant of a page is one
+INK_THRESHOLD = 240  # Gray levels below this count as ink when cropping margins
+CROP_PADDING = 16  # Pixels of margin kept around the ink
+
+# (page, format, grayscale, max side) -> base64. Shared by all providers: a run of
+# the intelligent pipeline sends one page to several passes (and possibly
+# a second provider). Pages are held weakly, so entries end with the request
+_encode_cache = IdentityCache(ENCODE_CACHE_SIZE)
+
+
+def _tight_crop(image: Image.Image) -> Image.Image:
+    """Crop blank margins, keeping a little padding around the ink."""
+    # point() is a lookup table in C; getbbox() finds the non-zero extent
+    gray = image if image.mode == "L" else image.convert("L")
+    bbox = gray.point(lambda v: 255 if v < INK_THRESHOLD else 0).getbbox()
+    if bbox is None:
+        return image  # Blank page: nothing to crop to
+    left, top, right, bottom = bbox
+    box = (
+        max(0, left - CROP_PADDING), max(0, top - CROP_PADDING),
+        min(image.width, right + CROP_PADDING), min(image.height, bottom + CROP_PADDING)
+    )
+    if box == (0, 0, image.width, image.height):
+        return image
+    return image.crop(box)
 
 
 class BaseVisionProvider(ABC):
     """Abstract base class for vision providers."""
     
+    # Token limits callers size prompts against (conservative for unknown models)
+    context_window: int = 8192
+    max_output_tokens: int = 2048
+    # Long edge pages are sent at. Past the size the API itself resizes to,
+    # extra pixels only cost upload and encode time
+    max_image_side: int = 2048
+    
     def __init__(self, model_name: str):
         self.model_name = model_name
+        self.grayscale = settings.vision_grayscale
     
     @abstractmethod
-    async def analyze(self, image: Image.Image, prompt: str) -> str:
-        """Analyze image with prompt and return text response."""
+    async def analyze(self, image: Image.Image, prompt: str, detail: str = "auto", json_mode: bool = False) -> str:
+        """
+        Analyze image with prompt and return text response.
+        
+        detail ("low", "high" or "auto") sets the image resolution on APIs that
+        bill by it (OpenAI-style image_url); other providers ignore it.
+        
+        json_mode asks the API to constrain the reply to a JSON object where
+        it can (the prompt must still describe the object). Providers
+        without such a switch rely on the prompt alone.
+        """
         pass
     
     @abstractmethod
@@ -33,43 +83,126 @@ class BaseVisionProvider(ABC):
         """Check if provider is configured and available."""
         pass
     
-    def _image_to_base64(self, image: Image.Image, format: str = "JPEG") -> str:
-        """Convert PIL Image to base64."""
+    async def analyze_many(
+        self,
+        images: List[Image.Image],
+        prompt: str,
+        concurrency: Optional[int] = None,
+        detail: str = "auto"
+    ) -> List[Union[str, BaseException]]:
+        """
+        Analyze several images with the same prompt concurrently.
+        
+        Args:
+            images: Images to analyze
+            prompt: Prompt sent with every image
+            concurrency: Max requests in flight. None = settings.vision_concurrency.
+            detail: Image detail level passed to analyze()
+        
+        Returns:
+            One entry per image, in order: the response text, or the exception
+            that image finally failed with (one bad page doesn't sink the rest)
+        """
+        limit = asyncio.Semaphore(max(1, concurrency or settings.vision_concurrency))
+        
+        async def one(image: Image.Image) -> str:
+            async with limit:
+                return await self._analyze_with_retry(image, prompt, detail)
+        
+        return list(await asyncio.gather(*map(one, images), return_exceptions=True))
+    
+    async def _analyze_with_retry(
+        self, image: Image.Image, prompt: str, detail: str, json_mode: bool = False
+    ) -> str:
+        """analyze(), retried with exponential backoff on rate limits and 5xx."""
+        delay = RETRY_BASE_DELAY
+        for attempt in range(RETRY_ATTEMPTS):
+            try:
+                return await self.analyze(image, prompt, detail, json_mode)
+            except httpx.HTTPStatusError as e:
+                status = e.response.status_code
+                if attempt == RETRY_ATTEMPTS - 1 or (status != 429 and status < 500):
+                    raise
+            await asyncio.sleep(delay)
+            delay *= 2
+    
+    def _image_to_base64(self, image: Image.Image, format: str = "JPEG", grayscale: Optional[bool] = None) -> str:
+        """
+        Convert PIL Image to base64.
+        
+        grayscale (None = the provider's setting) sends a single 8-bit channel,
+        for pages where colour carries no meaning.
+        """
+        if grayscale is None:
+            grayscale = self.grayscale
+        variant = (format, grayscale, self.max_image_side)
+        b64 = _encode_cache.get(image, variant)
+        if b64 is not None:
+            return b64
+        
         buffered = io.BytesIO()
-        # Resize for efficiency
-        img_copy = image.copy()
-        max_size = 2048
-        if max(img_copy.size) > max_size:
-            img_copy.thumbnail((max_size, max_size), Image.Resampling.LANCZOS)
-        img_copy.save(buffered, format=format, quality=85)
-        return base64.b64encode(buffered.getvalue()).decode()
+        # Resize for efficiency (shared with other engines sending this page)
+        img_small = downscale(image, self.max_image_side)
+        if grayscale:
+            if img_small.mode != "L":
+                img_small = img_small.convert("L")
+        elif format == "JPEG" and img_small.mode not in ("RGB", "L"):
+            img_small = img_small.convert("RGB")
+        # Margins cost upload bytes and vision tokens but carry nothing.
+        # Done after the downscale so the ink scan touches fewer pixels
+        img_small = _tight_crop(img_small)
+        img_small.save(buffered, format=format, quality=85)
+        # getbuffer() encodes from the BytesIO memory without a bytes copy
+        b64 = base64.b64encode(buffered.getbuffer()).decode("ascii")
+        _encode_cache.put(image, b64, variant)
+        return b64
 
 
 class GeminiProvider(BaseVisionProvider):
     """Google Gemini provider."""
     
+    context_window = 1_000_000
+    max_output_tokens = 8192  # SDK default
+    max_image_side = 3072  # Larger pages are resized server-side
+    
     def __init__(self, model_name: str = "gemini-2.0-flash-exp"):
         super().__init__(model_name)
-        try:
+        # The SDK import and model setup take seconds; they wait for the
+        # first analyze() so building an unused provider stays cheap
+        self.model = None
+        self.genai = None
+    
+    def _ensure_model(self):
+        if self.model is None:
             import google.generativeai as genai
             genai.configure(api_key=settings.gemini_api_key)
-            self.model = genai.GenerativeModel(model_name)
+            self.model = genai.GenerativeModel(self.model_name)
             self.genai = genai
-        except Exception as e:
-            print(f"⚠️  Failed to initialize Gemini: {e}")
-            self.model = None
+        return self.model
     
     def is_available(self) -> bool:
-        return bool(settings.gemini_api_key and self.model)
+        # find_spec locates the SDK without importing it
+        try:
+            installed = importlib.util.find_spec("google.generativeai") is not None
+        except ModuleNotFoundError:
+            installed = False
+        return bool(settings.gemini_api_key) and installed
     
-    async def analyze(self, image: Image.Image, prompt: str) -> str:
-        response = self.model.generate_content([prompt, image])
+    async def analyze(self, image: Image.Image, prompt: str, detail: str = "auto", json_mode: bool = False) -> str:
+        config = {"response_mime_type": "application/json"} if json_mode else None
+        # The SDK uploads the PIL image as given, so cap its size here.
+        # Page before prompt keeps a shared prefix for implicit caching
+        page = downscale(image, self.max_image_side)
+        response = self._ensure_model().generate_content([page, prompt], generation_config=config)
         return response.text
 
 
 class OpenAIProvider(BaseVisionProvider):
     """OpenAI GPT-4 Vision provider."""
     
+    context_window = 128_000
+    max_output_tokens = 4096
+    
     def __init__(self, model_name: str = "gpt-4-vision-preview"):
         super().__init__(model_name)
         self.api_key = settings.openai_api_key
@@ -78,8 +211,8 @@ class OpenAIProvider(BaseVisionProvider):
     def is_available(self) -> bool:
         return bool(self.api_key)
     
-    async def analyze(self, image: Image.Image, prompt: str) -> str:
-        img_b64 = self._image_to_base64(image)
+    async def analyze(self, image: Image.Image, prompt: str, detail: str = "auto", json_mode: bool = False) -> str:
+        img_b64 = await asyncio.to_thread(self._image_to_base64, image)
         
         payload = {
             "model": self.model_name,
@@ -87,27 +220,31 @@ class OpenAIProvider(BaseVisionProvider):
                 {
                     "role": "user",
                     "content": [
-                        {"type": "text", "text": prompt},
+                        # Image first: every pass on this page then shares
+                        # the same prefix, which the API caches
                         {
                             "type": "image_url",
                             "image_url": {
-                                "url": f"data:image/jpeg;base64,{img_b64}"
+                                "url": f"data:image/jpeg;base64,{img_b64}",
+                                "detail": detail
                             }
-                        }
+                        },
+                        {"type": "text", "text": prompt}
                     ]
                 }
             ],
-            "max_tokens": 4096
+            "max_tokens": self.max_output_tokens
         }
+        if json_mode:
+            payload["response_format"] = {"type": "json_object"}
         
-        async with httpx.AsyncClient(timeout=120.0) as client:
-            response = await client.post(
-                self.base_url,
-                headers={"Authorization": f"Bearer {self.api_key}"},
-                json=payload
-            )
-            response.raise_for_status()
-            data = response.json()
+        response = await get_api_client().post(
+            self.base_url,
+            headers={"Authorization": f"Bearer {self.api_key}"},
+            json=payload
+        )
+        response.raise_for_status()
+        data = response.json()
         
         return data["choices"][0]["message"]["content"]
 
@@ -115,20 +252,30 @@ class OpenAIProvider(BaseVisionProvider):
 class AnthropicProvider(BaseVisionProvider):
     """Anthropic Claude provider."""
     
+    context_window = 200_000
+    max_output_tokens = 4096
+    max_image_side = 1568  # Anthropic resizes anything with a longer edge
+    
     def __init__(self, model_name: str = "claude-3-5-sonnet-20241022"):
         super().__init__(model_name)
         self.api_key = settings.anthropic_api_key
         self.base_url = "https://api.anthropic.com/v1/messages"
+        # Marks the page image as a cacheable prefix: Pass 1 writes it and
+        # the later passes on the same page read it at a tenth of the price.
+        # Prefixes under the model's minimum size are simply not cached
+        self._cache_control = (
+            {"cache_control": {"type": "ephemeral"}} if settings.vision_prompt_cache else {}
+        )
     
     def is_available(self) -> bool:
         return bool(self.api_key)
     
-    async def analyze(self, image: Image.Image, prompt: str) -> str:
-        img_b64 = self._image_to_base64(image)
+    async def analyze(self, image: Image.Image, prompt: str, detail: str = "auto", json_mode: bool = False) -> str:
+        img_b64 = await asyncio.to_thread(self._image_to_base64, image)
         
         payload = {
             "model": self.model_name,
-            "max_tokens": 4096,
+            "max_tokens": self.max_output_tokens,
             "messages": [
                 {
                     "role": "user",
@@ -139,7 +286,8 @@ class AnthropicProvider(BaseVisionProvider):
                                 "type": "base64",
                                 "media_type": "image/jpeg",
                                 "data": img_b64
-                            }
+                            },
+                            **self._cache_control
                         },
                         {
                             "type": "text",
@@ -150,17 +298,16 @@ class AnthropicProvider(BaseVisionProvider):
             ]
         }
         
-        async with httpx.AsyncClient(timeout=120.0) as client:
-            response = await client.post(
-                self.base_url,
-                headers={
-                    "x-api-key": self.api_key,
-                    "anthropic-version": "2023-06-01"
-                },
-                json=payload
-            )
-            response.raise_for_status()
-            data = response.json()
+        response = await get_api_client().post(
+            self.base_url,
+            headers={
+                "x-api-key": self.api_key,
+                "anthropic-version": "2023-06-01"
+            },
+            json=payload
+        )
+        response.raise_for_status()
+        data = response.json()
         
         return data["content"][0]["text"]
 
@@ -168,6 +315,12 @@ class AnthropicProvider(BaseVisionProvider):
 class OllamaProvider(BaseVisionProvider):
     """Ollama local models provider."""
     
+    context_window = 4096  # Sent as num_ctx
+    max_output_tokens = 2048
+    # Local models turn every pixel patch into context tokens; a page at
+    # 2048px wouldn't leave room in num_ctx for the prompt and reply
+    max_image_side = 1024
+    
     def __init__(self, model_name: str = "llava:13b"):
         super().__init__(model_name)
         self.host = settings.ollama_host
@@ -181,30 +334,25 @@ class OllamaProvider(BaseVisionProvider):
         except:
             return False
     
-    async def analyze(self, image: Image.Image, prompt: str) -> str:
-        img_b64 = self._image_to_base64(image)
+    async def analyze(self, image: Image.Image, prompt: str, detail: str = "auto", json_mode: bool = False) -> str:
+        img_b64 = await asyncio.to_thread(self._image_to_base64, image)
         
         payload = {
             "model": self.model_name,
             "prompt": prompt,
             "images": [img_b64],
-            "stream": False,
             "options": {
                 "temperature": 0.2,
-                "num_ctx": 4096,
-                "num_predict": 2048
+                "num_ctx": self.context_window,
+                "num_predict": self.max_output_tokens
             }
         }
+        if json_mode:
+            payload["format"] = "json"
         
         timeout = httpx.Timeout(300.0, connect=60.0)
         
-        async with httpx.AsyncClient(timeout=timeout) as client:
-            response = await client.post(
-                f"{self.host}/api/generate",
-                json=payload
-            )
-            response.raise_for_status()
-            data = response.json()
+        data = await ollama_generate(payload, timeout=timeout)
         
         return data.get("response", "").strip()
 
@@ -212,6 +360,10 @@ class OllamaProvider(BaseVisionProvider):
 class OpenRouterProvider(BaseVisionProvider):
     """OpenRouter proxy provider."""
     
+    # Depends on the routed model; sized for the default Claude
+    context_window = 128_000
+    max_output_tokens = 4096
+    
     def __init__(self, model_name: str = "anthropic/claude-3.5-sonnet"):
         super().__init__(model_name)
         self.api_key = settings.openrouter_api_key
@@ -220,8 +372,8 @@ class OpenRouterProvider(BaseVisionProvider):
     def is_available(self) -> bool:
         return bool(self.api_key)
     
-    async def analyze(self, image: Image.Image, prompt: str) -> str:
-        img_b64 = self._image_to_base64(image)
+    async def analyze(self, image: Image.Image, prompt: str, detail: str = "auto", json_mode: bool = False) -> str:
+        img_b64 = await asyncio.to_thread(self._image_to_base64, image)
         
         payload = {
             "model": self.model_name,
@@ -229,34 +381,135 @@ class OpenRouterProvider(BaseVisionProvider):
                 {
                     "role": "user",
                     "content": [
-                        {"type": "text", "text": prompt},
+                        # Image first: every pass on this page then shares
+                        # the same prefix, which the API caches
                         {
                             "type": "image_url",
                             "image_url": {
-                                "url": f"data:image/jpeg;base64,{img_b64}"
+                                "url": f"data:image/jpeg;base64,{img_b64}",
+                                "detail": detail
                             }
-                        }
+                        },
+                        {"type": "text", "text": prompt}
                     ]
                 }
             ]
         }
+        if json_mode:
+            # Forwarded to models that support it, dropped for the rest
+            payload["response_format"] = {"type": "json_object"}
         
-        async with httpx.AsyncClient(timeout=120.0) as client:
-            response = await client.post(
-                self.base_url,
-                headers={
-                    "Authorization": f"Bearer {self.api_key}",
-                    "HTTP-Referer": "https://surya-ocr.app",
-                    "X-Title": "Surya OCR"
-                },
-                json=payload
-            )
-            response.raise_for_status()
-            data = response.json()
+        response = await get_api_client().post(
+            self.base_url,
+            headers={
+                "Authorization": f"Bearer {self.api_key}",
+                "HTTP-Referer": "https://surya-ocr.app",
+                "X-Title": "Surya OCR"
+            },
+            json=payload
+        )
+        response.raise_for_status()
+        data = response.json()
         
         return data["choices"][0]["message"]["content"]
 
 
+class CachedVisionProvider(BaseVisionProvider):
+    """
+    Wraps a provider and answers repeated (image, prompt, model) requests
+    from the on-disk response cache instead of calling the model again.
+    """
+    
+    def __init__(self, inner: BaseVisionProvider):
+        super().__init__(inner.model_name)
+        self.inner = inner
+        self.context_window = inner.context_window
+        self.max_output_tokens = inner.max_output_tokens
+        self._cache = get_response_cache(settings.vision_cache_path)
+    
+    def is_available(self) -> bool:
+        return self.inner.is_available()
+    
+    async def analyze(self, image: Image.Image, prompt: str, detail: str = "auto", json_mode: bool = False) -> str:
+        request = f"{detail}\0json\0{prompt}" if json_mode else f"{detail}\0{prompt}"
+        key = response_key(image, request, f"{type(self.inner).__name__}:{self.model_name}")
+        cached = await self._cache.get(key)
+        if cached is not None:
+            return cached
+        response = await self.inner.analyze(image, prompt, detail, json_mode)
+        await self._cache.put(key, response)
+        return response
+
+
+class FallbackProvider(BaseVisionProvider):
+    """
+    Tries providers in order, moving on when one fails or exceeds the
+    per-provider timeout. Rate limits and 5xx get a backoff retry first.
+    """
+    
+    def __init__(self, providers: List[BaseVisionProvider], timeout: Optional[float] = None):
+        super().__init__(providers[0].model_name)
+        self.providers = providers
+        self.timeout = timeout
+        # Any of them may end up answering, so size prompts for the smallest
+        self.context_window = min(p.context_window for p in providers)
+        self.max_output_tokens = min(p.max_output_tokens for p in providers)
+    
+    def is_available(self) -> bool:
+        return any(p.is_available() for p in self.providers)
+    
+    async def analyze(self, image: Image.Image, prompt: str, detail: str = "auto", json_mode: bool = False) -> str:
+        last_error: Optional[BaseException] = None
+        for provider in self.providers:
+            if not provider.is_available():
+                continue
+            try:
+                return await asyncio.wait_for(
+                    provider._analyze_with_retry(image, prompt, detail, json_mode), self.timeout
+                )
+            except Exception as e:
+                print(f"⚠️  {type(provider).__name__} failed ({e!r}), trying next provider")
+                last_error = e
+        raise last_error or RuntimeError("No vision provider available")
+
+
+class RaceProvider(BaseVisionProvider):
+    """
+    Sends the same request to every provider at once and returns the first
+    successful answer, cancelling the rest. Costs one call per provider and
+    buys the latency of the fastest healthy one.
+    """
+    
+    def __init__(self, providers: List[BaseVisionProvider]):
+        super().__init__(providers[0].model_name)
+        self.providers = providers
+        self.context_window = min(p.context_window for p in providers)
+        self.max_output_tokens = min(p.max_output_tokens for p in providers)
+    
+    def is_available(self) -> bool:
+        return any(p.is_available() for p in self.providers)
+    
+    async def analyze(self, image: Image.Image, prompt: str, detail: str = "auto", json_mode: bool = False) -> str:
+        pending = {
+            asyncio.create_task(p.analyze(image, prompt, detail, json_mode))
+            for p in self.providers if p.is_available()
+        }
+        if not pending:
+            raise RuntimeError("No vision provider available")
+        last_error: Optional[BaseException] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    last_error = task.exception()
+            raise last_error
+        finally:
+            for task in pending:
+                task.cancel()
+
+
 def get_vision_provider(provider: str = None, model: str = None) -> BaseVisionProvider:
     """
     Factory function to get the appropriate vision provider.
@@ -282,5 +535,20 @@ def get_vision_provider(provider: str = None, model: str = None) -> BaseVisionPr
     if provider not in providers:
         raise ValueError(f"Unknown provider: {provider}. Available: {list(providers.keys())}")
     
-    return providers[provider](model_name=model)
+    instance = providers[provider](model_name=model)
+    
+    fallbacks = [
+        name for name in (n.strip() for n in settings.vision_fallback_providers.split(","))
+        if name and name != provider
+    ]
+    unknown = [name for name in fallbacks if name not in providers]
+    if unknown:
+        raise ValueError(f"Unknown fallback provider(s): {unknown}. Available: {list(providers.keys())}")
+    if fallbacks:
+        instance = FallbackProvider(
+            [instance] + [providers[name]() for name in fallbacks],
+            timeout=settings.vision_fallback_timeout
+        )
+    
+    return CachedVisionProvider(instance) if settings.vision_cache_enabled else instance
 
@@ -0,0 +1,106 @@
+"""Shared HTTP clients for the pipeline's model-server and cloud API calls."""
+from typing import Any, Dict, Optional
+import httpx
+from config import settings
+
+try:
+    import orjson
+    _json_loads = orjson.loads
+    _json_dumps = orjson.dumps
+except ImportError:
+    import json
+    _json_loads = json.loads
+    _json_dumps = lambda obj: json.dumps(obj).encode()
+
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+# HTTP/2 lets concurrent calls to a cloud API share one TLS connection;
+# it needs the optional h2 package (pip install httpx[http2])
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+_client: Optional[httpx.AsyncClient] = None
+_api_client: Optional[httpx.AsyncClient] = None
+
+
+def get_ollama_client() -> httpx.AsyncClient:
+    """
+    Keep-alive client shared by every pipeline module talking to Ollama.
+    
+    Created on first use; nothing awaits in between, so concurrent callers
+    on the event loop cannot race to build two. Pass a per-request timeout
+    where a call needs a different budget than the default.
+    """
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            base_url=settings.ollama_host,
+            timeout=httpx.Timeout(120.0, connect=5.0, write=30.0, pool=30.0),
+            limits=httpx.Limits(
+                max_connections=64,
+                max_keepalive_connections=32,
+                keepalive_expiry=300.0
+            )
+        )
+    return _client
+
+
+async def ollama_generate(payload: Dict[str, Any], timeout: Any = None) -> Dict[str, Any]:
+    """
+    Call /api/generate in streaming mode and return the final message with
+    the whole generated text under "response" (like a stream=False reply).
+    
+    Streaming keeps the read timeout per chunk rather than per page, so
+    long generations don't time out while tokens are still arriving. A
+    stream that ends before its done message raises instead of returning
+    the partial text (which callers would cache).
+    """
+    body = _json_dumps({**payload, "stream": True})
+    kwargs = {} if timeout is None else {"timeout": timeout}
+    parts, last = [], {}
+    async with get_ollama_client().stream(
+        "POST", "/api/generate", content=body, headers=JSON_HEADERS, **kwargs
+    ) as r:
+        r.raise_for_status()
+        async for line in r.aiter_lines():
+            if not line:
+                continue
+            last = _json_loads(line)
+            if "error" in last:
+                raise RuntimeError(f"Ollama error: {last['error']}")
+            parts.append(last.get("response") or "")
+            if last.get("done"):
+                break
+        else:
+            raise RuntimeError("Ollama stream ended before the reply was done")
+    last["response"] = "".join(parts)
+    return last
+
+
+def get_api_client() -> httpx.AsyncClient:
+    """
+    Keep-alive client for the hosted vision APIs (OpenAI, Anthropic, OpenRouter).
+    
+    Reusing it skips the TCP and TLS handshake on every call after the first.
+    Callers pass absolute URLs and their own auth headers.
+    """
+    global _api_client
+    if _api_client is None or _api_client.is_closed:
+        _api_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(120.0, connect=10.0),
+            limits=httpx.Limits(max_connections=64, max_keepalive_connections=32),
+            http2=HTTP2_AVAILABLE
+        )
+    return _api_client
+
+
+async def aclose_clients():
+    """Close the shared clients (call on application shutdown)."""
+    global _client, _api_client
+    for client in (_client, _api_client):
+        if client is not None:
+            await client.aclose()
+    _client = _api_client = None
@@ -0,0 +1,134 @@
+"""Image helpers shared by the pipeline's engines and providers."""
+import hashlib
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Any, Hashable, List, Optional, Tuple
+from PIL import Image
+
+DOWNSCALE_CACHE_SIZE = 8  # (page, size) variants kept for reuse
+HASH_CACHE_SIZE = 8  # Page hashes kept for reuse
+
+
+class IdentityCache:
+    """
+    Small LRU of values derived from image objects, keyed by identity.
+    
+    Entries hold their image only through a weak reference and are evicted
+    by a finalizer when it is collected: the cache never keeps a finished
+    request's pages alive, and an id() reused by a later image can't match
+    a stale entry. Values must not reference the source image.
+    """
+    
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        # (id(image), variant) -> (weakref to image, finalizer, value)
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        # Reentrant: dropping an evicted value can collect another cached
+        # image, whose finalizer then runs on this thread under the lock.
+        # Callers run on worker threads too
+        self._lock = threading.RLock()
+    
+    def get(self, image: Image.Image, variant: Hashable = None) -> Optional[Any]:
+        key = (id(image), variant)
+        with self._lock:
+            hit = self._entries.get(key)
+            if hit is None or hit[0]() is not image:
+                return None
+            self._entries.move_to_end(key)
+            return hit[2]
+    
+    def put(self, image: Image.Image, value: Any, variant: Hashable = None) -> None:
+        key = (id(image), variant)
+        ref = weakref.ref(image)
+        finalizer = weakref.finalize(image, self._evict, key, ref)
+        finalizer.atexit = False  # Nothing worth doing at interpreter exit
+        with self._lock:
+            old = self._entries.pop(key, None)
+            self._entries[key] = (ref, finalizer, value)
+            if old is not None:
+                old[1].detach()
+            while len(self._entries) > self.maxsize:
+                _, (_, evicted, _) = self._entries.popitem(last=False)
+                evicted.detach()
+    
+    def _evict(self, key: tuple, ref: "weakref.ref") -> None:
+        with self._lock:
+            hit = self._entries.get(key)
+            if hit is not None and hit[0] is ref:
+                del self._entries[key]
+
+
+# (page, max_side) -> downscaled copy. One page goes through the classifier,
+# the vision engines and several provider passes; they share the resized
+# copy instead of each resampling the full page
+_downscaled = IdentityCache(DOWNSCALE_CACHE_SIZE)
+
+# page -> digest. The Pass-1 cache and the response cache both key on the
+# page's pixels; hashing a large page is a full pass over its bytes, so
+# each page is hashed once
+_hashes = IdentityCache(HASH_CACHE_SIZE)
+
+
+def downscale(image: Image.Image, max_side: int) -> Image.Image:
+    """
+    Image fitted within max_side on its long edge (the image itself if it
+    already fits). Never modifies the input.
+    """
+    long_side = max(image.size)
+    if long_side <= max_side:
+        return image
+    
+    small = _downscaled.get(image, max_side)
+    if small is not None:
+        return small
+    
+    scale = max_side / long_side
+    # reducing_gap box-reduces most of the way in C, then a bilinear pass
+    # finishes; vision models can't tell it from LANCZOS at these sizes
+    small = image.resize(
+        (max(1, round(image.width * scale)), max(1, round(image.height * scale))),
+        Image.Resampling.BILINEAR,
+        reducing_gap=2.0
+    )
+    _downscaled.put(image, small, max_side)
+    return small
+
+
+def content_key(image: Image.Image) -> bytes:
+    """
+    Hash of the exact pixels (plus mode and size) of a page. Memoized per
+    image object, so the image must not be modified in place afterwards
+    (the pipeline never does).
+    """
+    digest = _hashes.get(image)
+    if digest is not None:
+        return digest
+    
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f"{image.mode}\0{image.width}x{image.height}\0".encode())
+    h.update(image.tobytes())
+    digest = h.digest()
+    _hashes.put(image, digest)
+    return digest
+
+
+def unique_pages(images: List[Image.Image]) -> Tuple[List[Image.Image], List[int]]:
+    """
+    Drop pixel-identical pages from a job.
+    
+    Returns the distinct pages and, for every input page, the index of its
+    distinct page. Matching is exact: near-duplicate hashing would merge
+    filled-in copies of the same form, which only differ in a few strokes.
+    """
+    seen = {}
+    uniques: List[Image.Image] = []
+    slots: List[int] = []
+    for image in images:
+        key = content_key(image)
+        slot = seen.get(key)
+        if slot is None:
+            slot = seen[key] = len(uniques)
+            uniques.append(image)
+        slots.append(slot)
+    return uniques, slots
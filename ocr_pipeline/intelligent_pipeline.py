@@ -6,16 +6,77 @@ Pass 2: Dual OCR - Run BOTH Tesseract AND Surya in parallel
 Pass 3: Vision-Guided Fusion - Gemini picks best from each (Gemini 2.5 Pro)
 """
 import io
+import re
+import json
+import logging
 import base64
 import httpx
 import asyncio
-from typing import Dict, Any, Tuple, Optional
+from collections import OrderedDict
+from typing import Dict, Any, List, Tuple, Optional
 from PIL import Image
 from config import settings
-from .engines.base_engine import OCRResult
+
+try:
+    from Levenshtein import ratio as _similarity
+except ImportError:
+    from difflib import SequenceMatcher
+    
+    def _similarity(a: str, b: str) -> float:
+        return SequenceMatcher(None, a, b).ratio()
+
+from .engines.base_engine import OCRResult, expand_duplicates
 from .engines.tesseract_engine import TesseractEngine
 from .engines.surya_engine import SuryaEngine
 from .engines.vision_providers import get_vision_provider
+from .imaging import content_key, unique_pages
+from .postprocessor import OCRPostProcessor
+
+# Progress goes through logging so it costs nothing when INFO is disabled
+# (batch runs); lazy %-style args skip formatting for filtered records
+log = logging.getLogger(__name__)
+BANNER_RULE = "=" * 70
+
+ANALYSIS_CACHE_SIZE = 256  # Pass-1 analyses remembered per process
+
+# (page hash, provider, model) -> parsed Pass-1 fields. Re-running a page
+# (retries, the perfect_tables comparison, reprocessing a batch) skips the
+# analysis round-trip. Exact pixel match only: near-identical pages can
+# differ in exactly what Pass 1 is asked about (e.g. handwriting added)
+_analysis_cache: "OrderedDict[tuple, Dict[str, Any]]" = OrderedDict()
+
+# Sizing the OCR text sent to Pass-3 fusion. No tokenizer is available for
+# most providers, so tokens are estimated from characters (OCR text is
+# digit- and punctuation-heavy, hence the low ratio)
+CHARS_PER_TOKEN = 3
+FUSION_OVERHEAD_TOKENS = 3000  # Fusion instructions plus the page image
+MIN_FUSION_OCR_CHARS = 2000  # Per output; the old fixed cut, kept as a floor
+
+# "KEY: value" fields of the Pass-1 reply. Matched anywhere (the model
+# often decorates them, e.g. "**TYPE:** print"); the lookahead captures
+# the rest of the line without consuming it, so a second field on the
+# same line is still found
+ANALYSIS_FIELD_RE = re.compile(
+    r'(type|complexity|tables|handwriting|signatures|language|recommended_engine):(?=([^\n]*))',
+    re.IGNORECASE
+)
+
+# Outermost ``` fence around the combined Pass-1/3 JSON reply, if any
+JSON_FENCE_RE = re.compile(r'^\s*```(?:json)?\s*(.*?)\s*```\s*$', re.DOTALL)
+
+
+# One instance per engine class for the whole process, built on first use.
+# The API builds a pipeline per request; sharing lets concurrent requests
+# land in one Surya batch and one Tesseract worker pool, and a pipeline
+# that only ever needs Tesseract never constructs Surya at all
+_engines: Dict[type, Any] = {}
+
+
+def _shared_engine(cls):
+    engine = _engines.get(cls)
+    if engine is None:
+        engine = _engines[cls] = cls()
+    return engine
 
 
 class DocumentAnalysis:
@@ -34,6 +95,77 @@ class DocumentAnalysis:
         self.raw_analysis = data.get('raw_analysis', '')
 
 
+def _as_bool(value: Any) -> bool:
+    if isinstance(value, str):
+        return value.strip().lower() in ('yes', 'true', '1')
+    return bool(value)
+
+
+def _normalize_analysis(raw: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Map a model's JSON analysis onto DocumentAnalysis fields, coercing the
+    loose values models produce ("Yes", "Printed", "HIGH") to the ones the
+    pipeline branches on. Missing fields are left to the defaults.
+    """
+    data: Dict[str, Any] = {}
+    doc_type = str(raw.get('document_type') or '').lower()
+    if doc_type:
+        if 'handwrit' in doc_type:
+            data['document_type'] = 'handwriting'
+        elif 'mixed' in doc_type:
+            data['document_type'] = 'mixed'
+        else:
+            data['document_type'] = 'print'
+    complexity = str(raw.get('complexity') or '').lower()
+    if complexity:
+        if 'high' in complexity:
+            data['complexity'] = 'high'
+        elif 'low' in complexity:
+            data['complexity'] = 'low'
+        else:
+            data['complexity'] = 'medium'
+    for flag in ('has_tables', 'has_handwriting', 'has_signatures'):
+        if flag in raw:
+            data[flag] = _as_bool(raw[flag])
+    if raw.get('language'):
+        data['language'] = str(raw['language']).strip().lower()
+    issues = raw.get('quality_issues')
+    if issues:
+        data['quality_issues'] = [str(i) for i in issues] if isinstance(issues, list) else [str(issues)]
+    engine = str(raw.get('recommended_engine') or '').lower()
+    for name in ('tesseract', 'surya', 'vision'):
+        if name in engine:
+            data['recommended_engine'] = name
+            break
+    return data
+
+
+def _elide_middle(text: str, limit: int) -> str:
+    """Keep the head and tail of text within limit chars, marking the gap."""
+    if len(text) <= limit:
+        return text
+    head = limit // 2
+    tail = limit - head
+    return f"{text[:head]}\n… [{len(text) - limit} chars elided] …\n{text[-tail:]}"
+
+
+def _fit_to_budget(texts: List[Optional[str]], total_chars: int) -> List[Optional[str]]:
+    """
+    Share total_chars between texts, eliding the middle of any that don't fit.
+    
+    Short texts are sized first and their unused share goes to the longer
+    ones, so one long output isn't cut while the budget sits unused.
+    """
+    fitted = list(texts)
+    present = sorted((i for i, t in enumerate(texts) if t), key=lambda i: len(texts[i]))
+    remaining = total_chars
+    for n, i in enumerate(present):
+        limit = remaining // (len(present) - n)
+        fitted[i] = _elide_middle(texts[i], limit)
+        remaining -= min(len(texts[i]), limit)
+    return fitted
+
+
 class IntelligentOCRPipeline:
     """
     Intelligent multi-pass OCR pipeline that uses vision understanding
@@ -45,7 +177,9 @@ class IntelligentOCRPipeline:
         vision_provider: str = None, 
         vision_model: str = None,
         use_hybrid_ocr: bool = None,
-        perfect_tables: bool = None
+        perfect_tables: bool = None,
+        fuse_passes: bool = None,
+        adaptive_hybrid: bool = None
     ):
         """
         Initialize the intelligent pipeline.
@@ -55,24 +189,65 @@ class IntelligentOCRPipeline:
             vision_model: Model to use for vision provider. None = use settings default for that provider.
             use_hybrid_ocr: Run both Tesseract + Surya in parallel. None = use settings default.
             perfect_tables: Use vision provider only for perfect table formatting. None = use settings default.
+            fuse_passes: Single-engine mode only - analyze and correct in one vision call. None = use settings default.
+            adaptive_hybrid: Hybrid mode only - skip the engine a pure print/handwriting page doesn't need. None = use settings default.
         """
         # Use settings defaults if not specified
         self.vision_provider = vision_provider or settings.vision_provider
         self.vision_model = vision_model
         self.use_hybrid_ocr = use_hybrid_ocr if use_hybrid_ocr is not None else settings.use_hybrid_ocr
         self.perfect_tables = perfect_tables if perfect_tables is not None else settings.perfect_tables
+        self.fuse_passes = fuse_passes if fuse_passes is not None else settings.fuse_vision_passes
+        self.adaptive_hybrid = adaptive_hybrid if adaptive_hybrid is not None else settings.adaptive_hybrid_ocr
         
         # Initialize vision provider
         self.vision = get_vision_provider(self.vision_provider, self.vision_model)
         
         if not self.vision.is_available():
-            print(f"⚠️  {self.vision_provider} not available, falling back to Ollama")
+            log.warning("⚠️  %s not available, falling back to Ollama", self.vision_provider)
             self.vision_provider = "ollama"
             self.vision = get_vision_provider("ollama")
         
-        # Initialize OCR engines
-        self.tesseract = TesseractEngine()
-        self.surya = SuryaEngine()
+        # OCR engines are created on first use (see the properties below)
+        self.postprocessor = OCRPostProcessor()
+    
+    @property
+    def tesseract(self) -> TesseractEngine:
+        return _shared_engine(TesseractEngine)
+    
+    @property
+    def surya(self) -> SuryaEngine:
+        return _shared_engine(SuryaEngine)
+    
+    def _engines_agree(
+        self,
+        tesseract_text: Optional[str],
+        surya_text: Optional[str],
+        analysis: DocumentAnalysis
+    ) -> bool:
+        """
+        True when fusion has nothing to decide: both engines read the page
+        (near-)identically and it has no tables or handwriting to fix up.
+        """
+        if not tesseract_text or not surya_text or analysis.has_tables or analysis.has_handwriting:
+            return False
+        # Engines break lines and space words differently; compare the words
+        a = " ".join(tesseract_text.split())
+        b = " ".join(surya_text.split())
+        return _similarity(a, b) >= settings.fusion_skip_similarity
+    
+    def _sole_engine(self, analysis: DocumentAnalysis) -> Optional[str]:
+        """
+        The one engine a page needs in hybrid mode, or None to run both.
+        
+        Only clear-cut pages qualify: all print with no handwriting or
+        tables (Tesseract), or all handwriting (Surya).
+        """
+        if analysis.document_type == 'print' and not analysis.has_handwriting and not analysis.has_tables:
+            return 'tesseract' if self.tesseract.is_available() else None
+        if analysis.document_type == 'handwriting':
+            return 'surya'
+        return None
     
     async def pass1_analyze_document(self, image: Image.Image) -> DocumentAnalysis:
         """
@@ -80,13 +255,21 @@ class IntelligentOCRPipeline:
         
         Understand structure, content type, and quality before OCR.
         """
-        print(f"📊 Pass 1: Analyzing document with {self.vision_provider.upper()} ({self.vision.model_name})...")
+        log.info("📊 Pass 1: Analyzing document with %s (%s)...", self.vision_provider.upper(), self.vision.model_name)
+        
+        # Hashing every pixel is CPU work; keep it off the event loop
+        key = (await asyncio.to_thread(content_key, image), self.vision_provider, self.vision.model_name)
+        cached = _analysis_cache.get(key)
+        if cached is not None:
+            _analysis_cache.move_to_end(key)
+            log.info("  ✓ Reusing earlier analysis of this page")
+            return DocumentAnalysis(dict(cached))
         
         prompt = """Analyze this document image carefully. You must categorize the MAJORITY of the text.
 
 CRITICAL: Count the text carefully!
-- If 80%+ is PRINTED/TYPED text → TYPE: print
-- If 80%+ is HANDWRITTEN text → TYPE: handwriting  
+- If 80%+ is PRINTED/TYPED text → document_type: print
+- If 80%+ is HANDWRITTEN text → document_type: handwriting
 - Only use MIXED if truly 30-70% of each
 
 Questions to answer:
@@ -110,53 +293,67 @@ Questions to answer:
    - TESSERACT: Clean printed text, forms, invoices, even with a few handwritten notes
    - SURYA: Messy handwriting, hand-filled forms, or poor quality scans
    
-FORMAT YOUR RESPONSE:
-TYPE: [print/handwriting/mixed]
-PRINT_PERCENTAGE: [0-100%]
-HANDWRITING_PERCENTAGE: [0-100%]
-COMPLEXITY: [low/medium/high]
-TABLES: [yes/no - describe if yes]
-HANDWRITING: [yes/no - where located]
-QUALITY_ISSUES: [list any]
-RECOMMENDED_ENGINE: [tesseract/surya]
-
-Then explain your reasoning in 2-3 sentences."""
+Respond with ONLY this JSON object, no commentary:
+{"document_type": "print|handwriting|mixed", "print_percentage": 0-100, "handwriting_percentage": 0-100, "complexity": "low|medium|high", "has_tables": true|false, "has_handwriting": true|false, "handwriting_location": "signatures/notes/margins or empty", "has_signatures": true|false, "quality_issues": ["..."], "recommended_engine": "tesseract|surya"}"""
         
-        # Use configured vision provider
-        response = await self.vision.analyze(image, prompt)
+        # JSON mode where the provider has it; the answer is the fields
+        # alone, without the reasoning prose the model used to add
+        response = await self.vision.analyze(image, prompt, json_mode=True)
         
-        # Parse response
-        analysis_data = self._parse_analysis(response)
+        # Parse response (older prose-style replies are still understood)
+        analysis_data = self._parse_analysis_json(response)
         analysis_data['raw_analysis'] = response
         
+        _analysis_cache[key] = dict(analysis_data)
+        while len(_analysis_cache) > ANALYSIS_CACHE_SIZE:
+            _analysis_cache.popitem(last=False)
+        
         analysis = DocumentAnalysis(analysis_data)
         
-        print(f"  ✓ Type: {analysis.document_type}")
-        print(f"  ✓ Complexity: {analysis.complexity}")
-        print(f"  ✓ Has tables: {analysis.has_tables}")
-        print(f"  ✓ Has handwriting: {analysis.has_handwriting}")
-        print(f"  ✓ Recommended: {analysis.recommended_engine}")
+        log.info("  ✓ Type: %s", analysis.document_type)
+        log.info("  ✓ Complexity: %s", analysis.complexity)
+        log.info("  ✓ Has tables: %s", analysis.has_tables)
+        log.info("  ✓ Has handwriting: %s", analysis.has_handwriting)
+        log.info("  ✓ Recommended: %s", analysis.recommended_engine)
         
         return analysis
     
+    def _parse_analysis_json(self, response: str) -> Dict[str, Any]:
+        """Parse a JSON analysis reply, falling back to the "KEY: value" form."""
+        match = JSON_FENCE_RE.match(response)
+        try:
+            parsed = json.loads(match.group(1) if match else response)
+        except ValueError:
+            parsed = None
+        if not isinstance(parsed, dict):
+            return self._parse_analysis(response)
+        return _normalize_analysis(parsed)
+    
     def _parse_analysis(self, response: str) -> Dict[str, Any]:
         """Parse vision model's analysis response."""
-        data = {}
+        # One scan for every field; the first mention of each wins, and its
+        # value runs to the end of that line
+        fields = {}
+        for m in ANALYSIS_FIELD_RE.finditer(response):
+            key = m.group(1).lower()
+            if key not in fields:
+                fields[key] = m.group(2).lower().split(key + ':', 1)[0]
         
-        response_lower = response.lower()
+        data = {}
         
         # Document type
-        if 'type:' in response_lower:
-            if 'handwrit' in response_lower.split('type:')[1].split('\n')[0]:
+        if 'type' in fields:
+            type_line = fields['type']
+            if 'handwrit' in type_line:
                 data['document_type'] = 'handwriting'
-            elif 'mixed' in response_lower.split('type:')[1].split('\n')[0]:
+            elif 'mixed' in type_line:
                 data['document_type'] = 'mixed'
             else:
                 data['document_type'] = 'print'
         
         # Complexity
-        if 'complexity:' in response_lower:
-            comp_line = response_lower.split('complexity:')[1].split('\n')[0]
+        if 'complexity' in fields:
+            comp_line = fields['complexity']
             if 'high' in comp_line:
                 data['complexity'] = 'high'
             elif 'low' in comp_line:
@@ -164,29 +361,21 @@ Then explain your reasoning in 2-3 sentences."""
             else:
                 data['complexity'] = 'medium'
         
-        # Tables
-        if 'tables:' in response_lower:
-            tables_line = response_lower.split('tables:')[1].split('\n')[0]
-            data['has_tables'] = 'yes' in tables_line
-        
-        # Handwriting
-        if 'handwriting:' in response_lower:
-            hw_line = response_lower.split('handwriting:')[1].split('\n')[0]
-            data['has_handwriting'] = 'yes' in hw_line
-        
-        # Signatures
-        if 'signatures:' in response_lower:
-            sig_line = response_lower.split('signatures:')[1].split('\n')[0]
-            data['has_signatures'] = 'yes' in sig_line
+        # Tables, handwriting, signatures
+        if 'tables' in fields:
+            data['has_tables'] = 'yes' in fields['tables']
+        if 'handwriting' in fields:
+            data['has_handwriting'] = 'yes' in fields['handwriting']
+        if 'signatures' in fields:
+            data['has_signatures'] = 'yes' in fields['signatures']
         
         # Language
-        if 'language:' in response_lower:
-            lang_line = response_lower.split('language:')[1].split('\n')[0].strip()
-            data['language'] = lang_line
+        if 'language' in fields:
+            data['language'] = fields['language'].strip()
         
         # Recommended engine
-        if 'recommended_engine:' in response_lower:
-            rec_line = response_lower.split('recommended_engine:')[1].split('\n')[0]
+        if 'recommended_engine' in fields:
+            rec_line = fields['recommended_engine']
             if 'tesseract' in rec_line:
                 data['recommended_engine'] = 'tesseract'
             elif 'surya' in rec_line:
@@ -199,14 +388,18 @@ Then explain your reasoning in 2-3 sentences."""
     async def pass2_extract_text(
         self,
         image: Image.Image,
-        analysis: DocumentAnalysis
+        analysis: DocumentAnalysis,
+        tesseract_task: Optional[asyncio.Task] = None
     ) -> Tuple[str, str]:
         """
         Pass 2: Extract text using best engine based on analysis.
         
+        tesseract_task: Tesseract run started speculatively alongside Pass 1.
+        Its result is used if Tesseract is picked, otherwise it is cancelled.
+        
         Returns: (text, engine_used)
         """
-        print(f"🔤 Pass 2: Extracting text with recommended engine...")
+        log.info("🔤 Pass 2: Extracting text with recommended engine...")
         
         engine_name = analysis.recommended_engine
         
@@ -230,28 +423,32 @@ Then explain your reasoning in 2-3 sentences."""
             engine_name = analysis.recommended_engine or 'surya'
             reason = "vision model recommendation"
         
+        use_tesseract = engine_name == 'tesseract' and self.tesseract.is_available()
+        if tesseract_task is not None and not use_tesseract:
+            tesseract_task.cancel()
+        
         # Execute OCR
-        if engine_name == 'tesseract' and self.tesseract.is_available():
-            print(f"  ✓ Using Tesseract ({reason})")
-            result = await self.tesseract.process(image)
+        if use_tesseract:
+            log.info("  ✓ Using Tesseract (%s)", reason)
+            result = await (tesseract_task or self.tesseract.process(image))
             return result.text, 'tesseract'
         elif engine_name == 'tesseract' and not self.tesseract.is_available():
             # Tesseract wanted but not available
-            print(f"  ⚠️  Tesseract recommended but not installed!")
-            print(f"  ℹ️  Install from: https://github.com/UB-Mannheim/tesseract/wiki")
-            print(f"  ⏳ Falling back to Surya (slower but works)")
+            log.warning("  ⚠️  Tesseract recommended but not installed!")
+            log.warning("  ℹ️  Install from: https://github.com/UB-Mannheim/tesseract/wiki")
+            log.warning("  ⏳ Falling back to Surya (slower but works)")
             result = await self.surya.process(image)
             return result.text, 'surya_fallback'
         else:
             # Use Surya
-            print(f"  ✓ Using Surya ({reason})")
+            log.info("  ✓ Using Surya (%s)", reason)
             result = await self.surya.process(image)
             return result.text, 'surya'
     
     async def pass2_dual_extract(
         self,
         image: Image.Image,
-        analysis: DocumentAnalysis
+        analysis: Optional[DocumentAnalysis] = None
     ) -> Tuple[Optional[str], str, str]:
         """
         Pass 2 (Hybrid): Run BOTH Tesseract and Surya in parallel.
@@ -260,9 +457,12 @@ Then explain your reasoning in 2-3 sentences."""
         - Tesseract: Fast, excellent for printed text
         - Surya: Slower, excellent for handwriting and messy docs
         
+        Both engines always run, so the analysis is not needed and this can
+        run concurrently with Pass 1.
+        
         Returns: (tesseract_text, surya_text, engines_used)
         """
-        print(f"🔤 Pass 2: Running BOTH engines in parallel for maximum accuracy...")
+        log.info("🔤 Pass 2: Running BOTH engines in parallel for maximum accuracy...")
         
         # Run both engines in parallel
         tasks = []
@@ -270,20 +470,20 @@ Then explain your reasoning in 2-3 sentences."""
         
         # Add Tesseract task if available
         if self.tesseract.is_available():
-            print(f"  ⚡ Starting Tesseract (fast, for printed text)...")
+            log.info("  ⚡ Starting Tesseract (fast, for printed text)...")
             tasks.append(self.tesseract.process(image))
             engines_used.append('tesseract')
         else:
-            print(f"  ⚠️  Tesseract not available, skipping")
+            log.warning("  ⚠️  Tesseract not available, skipping")
             tasks.append(None)
         
         # Always add Surya task
-        print(f"  🐢 Starting Surya (thorough, for handwriting)...")
+        log.info("  🐢 Starting Surya (thorough, for handwriting)...")
         tasks.append(self.surya.process(image))
         engines_used.append('surya')
         
         # Run in parallel and wait for both
-        print(f"  ⏳ Running both engines simultaneously...")
+        log.info("  ⏳ Running both engines simultaneously...")
         results = await asyncio.gather(*[t for t in tasks if t is not None], return_exceptions=True)
         
         # Extract results
@@ -293,17 +493,17 @@ Then explain your reasoning in 2-3 sentences."""
         result_idx = 0
         if self.tesseract.is_available():
             if isinstance(results[result_idx], Exception):
-                print(f"  ⚠️  Tesseract failed: {results[result_idx]}")
+                log.warning("  ⚠️  Tesseract failed: %s", results[result_idx])
             else:
                 tesseract_text = results[result_idx].text
-                print(f"  ✓ Tesseract complete ({len(tesseract_text)} chars)")
+                log.info("  ✓ Tesseract complete (%s chars)", len(tesseract_text))
             result_idx += 1
         
         if isinstance(results[result_idx], Exception):
-            print(f"  ⚠️  Surya failed: {results[result_idx]}")
+            log.warning("  ⚠️  Surya failed: %s", results[result_idx])
         else:
             surya_text = results[result_idx].text
-            print(f"  ✓ Surya complete ({len(surya_text)} chars)")
+            log.info("  ✓ Surya complete (%s chars)", len(surya_text))
         
         engines_str = "+".join(engines_used)
         return tesseract_text, surya_text, engines_str
@@ -314,7 +514,8 @@ Then explain your reasoning in 2-3 sentences."""
         tesseract_text: Optional[str],
         surya_text: str,
         analysis: DocumentAnalysis,
-        engines_used: str
+        engines_used: str,
+        perfect_tables: bool = None
     ) -> str:
         """
         Pass 3 (Hybrid): Use Gemini to intelligently fuse BOTH OCR outputs.
@@ -328,24 +529,54 @@ Then explain your reasoning in 2-3 sentences."""
         - Using Tesseract for printed sections
         - Using Surya for handwritten sections
         - Correcting errors in both by comparing to image
+        
+        perfect_tables overrides the pipeline setting for this call.
         """
-        print(f"✨ Pass 3: Gemini fusion of both OCR outputs...")
+        log.info("✨ Pass 3: Gemini fusion of both OCR outputs...")
+        if perfect_tables is None:
+            perfect_tables = self.perfect_tables
+        
+        # Check if we need to upgrade to cloud provider for perfect tables
+        vision = self.vision
+        if perfect_tables and analysis.has_tables and self.vision_provider == "ollama":
+            log.info("  ℹ️  Upgrading to Gemini for perfect table formatting (perfect_tables=True)")
+            # Temporarily use Gemini for this document
+            temp_vision = get_vision_provider("gemini")
+            if temp_vision.is_available():
+                vision = temp_vision
+            else:
+                log.warning("  ⚠️  Gemini not available, using %s", self.vision_provider)
+        
+        # Size the OCR text to the model: whatever fits beside the fixed
+        # prompt, but no more than the model could write back out fused
+        n_texts = (tesseract_text is not None) + (surya_text is not None)
+        per_text_tokens = min(
+            (vision.context_window - FUSION_OVERHEAD_TOKENS) // (n_texts + 1),
+            vision.max_output_tokens
+        )
+        per_text_chars = max(MIN_FUSION_OCR_CHARS, per_text_tokens * CHARS_PER_TOKEN)
+        tesseract_text, surya_text = _fit_to_budget([tesseract_text, surya_text], per_text_chars * n_texts)
         
         # Build the fusion prompt
-        if tesseract_text:
+        if surya_text is None:
+            ocr_comparison = f"""**Tesseract Output** (only engine run):
+```
+{tesseract_text}
+```"""
+        elif tesseract_text is not None:
             ocr_comparison = f"""**Tesseract Output** (fast, good for printed text):
 ```
-{tesseract_text[:2000]}{"..." if len(tesseract_text) > 2000 else ""}
+{tesseract_text}
 ```
 
 **Surya Output** (thorough, good for handwriting):
 ```
-{surya_text[:2000]}{"..." if len(surya_text) > 2000 else ""}
+{surya_text}
 ```"""
         else:
             ocr_comparison = f"""**Surya Output** (only engine available):
 ```
-{surya_text[:2000]}{"..." if len(surya_text) > 2000 else ""}
+{surya_text}
 ```"""
         
         prompt = f"""You are an expert OCR correction specialist with perfect vision. You have the ORIGINAL IMAGE and TWO OCR outputs.
@@ -400,21 +631,9 @@ When OCR outputs disagree, look VERY CAREFULLY at the image:
 
 Output ONLY the corrected markdown. No commentary, no explanations, just the final text."""
         
-        # Check if we need to upgrade to cloud provider for perfect tables
-        if self.perfect_tables and analysis.has_tables and self.vision_provider == "ollama":
-            print(f"  ℹ️  Upgrading to Gemini for perfect table formatting (perfect_tables=True)")
-            # Temporarily use Gemini for this document
-            temp_vision = get_vision_provider("gemini")
-            if temp_vision.is_available():
-                fused = await temp_vision.analyze(image, prompt)
-            else:
-                print(f"  ⚠️  Gemini not available, using {self.vision_provider}")
-                fused = await self.vision.analyze(image, prompt)
-        else:
-            # Use configured provider
-            fused = await self.vision.analyze(image, prompt)
+        fused = await vision.analyze(image, prompt)
         
-        print(f"  ✓ Fusion complete - best of both engines!")
+        log.info("  ✓ Fusion complete - best of both engines!")
         
         return fused
     
@@ -434,7 +653,7 @@ Output ONLY the corrected markdown. No commentary, no explanations, just the fin
         - Format tables correctly
         - Fix alignment issues
         """
-        print(f"✨ Pass 3: Vision-guided fusion with {self.vision_provider.upper()} ({self.vision.model_name})...")
+        log.info("✨ Pass 3: Vision-guided fusion with %s (%s)...", self.vision_provider.upper(), self.vision.model_name)
         
         # Build context-aware prompt
         prompt = f"""You are an expert OCR correction specialist. You can see both the original document image and the raw OCR text.
@@ -478,40 +697,161 @@ Output ONLY the corrected, formatted markdown. No explanations or commentary."""
         # Use configured vision provider
         corrected = await self.vision.analyze(image, prompt)
         
-        print(f"  ✓ Correction and formatting complete")
+        log.info("  ✓ Correction and formatting complete")
         
         return corrected
     
-    async def process(self, image: Image.Image) -> OCRResult:
+    async def pass13_combined(
+        self,
+        image: Image.Image,
+        ocr_text: str,
+        engine_used: str
+    ) -> Tuple[DocumentAnalysis, str]:
+        """
+        Passes 1 + 3 in one vision call: analyze the page and correct the OCR text.
+        
+        Saves one image upload and round-trip per page. The analysis can no
+        longer steer engine choice, so the OCR text must be extracted first.
+        
+        Returns: (analysis, corrected_markdown)
+        """
+        log.info("✨ Pass 1+3: Combined analysis and correction with %s (%s)...", self.vision_provider.upper(), self.vision.model_name)
+        
+        prompt = f"""You are an expert OCR correction specialist. You can see both the original document image and the raw OCR text.
+
+**Raw OCR Output** (engine: {engine_used}):
+```
+{ocr_text}
+```
+
+**Your Task:**
+1. **Analyze the document**:
+   - document_type: "print" if 80%+ is printed, "handwriting" if 80%+ is handwritten, otherwise "mixed"
+   - complexity: "low" (single column), "medium" (some structure) or "high" (complex tables/layouts)
+   - has_tables / has_handwriting / has_signatures: true or false
+   - quality_issues: list of short strings
+2. **Look carefully at the image** and correct the OCR text against it:
+   - Fix misread characters, garbled words, number transpositions and punctuation
+   - Use proper headings (# ## ###), lists and markdown tables with | separators
+   - Preserve the document's structure; don't add or remove information
+
+Respond with ONLY this JSON object, no commentary:
+{{"analysis": {{"document_type": "...", "complexity": "...", "has_tables": false, "has_handwriting": false, "has_signatures": false, "quality_issues": []}}, "corrected_markdown": "..."}}"""
+        
+        response = await self.vision.analyze(image, prompt, json_mode=True)
+        analysis_data, corrected = self._parse_combined(response)
+        analysis_data['raw_analysis'] = response
+        analysis = DocumentAnalysis(analysis_data)
+        
+        log.info("  ✓ Type: %s", analysis.document_type)
+        log.info("  ✓ Has tables: %s", analysis.has_tables)
+        log.info("  ✓ Correction and formatting complete")
+        
+        return analysis, corrected
+    
+    def _parse_combined(self, response: str) -> Tuple[Dict[str, Any], str]:
+        """Split the combined reply into analysis fields and markdown."""
+        match = JSON_FENCE_RE.match(response)
+        body = match.group(1) if match else response
+        try:
+            parsed = json.loads(body)
+            data = parsed.get('analysis') or {}
+            corrected = parsed['corrected_markdown']
+            if not isinstance(data, dict) or not isinstance(corrected, str):
+                raise TypeError("unexpected field types")
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            # Model ignored the format; the reply is most likely just markdown
+            log.warning("  ⚠️  Combined reply was not the expected JSON (%s), using it as text", e)
+            return {}, response.strip()
+        return _normalize_analysis(data), corrected
+    
+    async def process(self, image: Image.Image, perfect_tables: bool = None) -> OCRResult:
         """
         Execute complete intelligent OCR pipeline.
         
+        Args:
+            image: PIL Image to process
+            perfect_tables: Per-call override of the pipeline's perfect_tables. None = keep it.
+        
         Returns final OCR result with all passes complete.
         """
-        print("\n" + "="*70)
+        log.info(BANNER_RULE)
         if self.use_hybrid_ocr:
-            print("🧠 INTELLIGENT HYBRID OCR PIPELINE (Dual Engine)")
+            log.info("🧠 INTELLIGENT HYBRID OCR PIPELINE (Dual Engine)")
         else:
-            print("🧠 INTELLIGENT MULTI-PASS OCR PIPELINE")
-        print("="*70 + "\n")
+            log.info("🧠 INTELLIGENT MULTI-PASS OCR PIPELINE")
+        log.info(BANNER_RULE)
         
-        # Pass 1: Analyze
-        analysis = await self.pass1_analyze_document(image)
+        # Pass 1 runs alongside Pass 2 below, or is folded into Pass 3 when fused
+        fused = self.fuse_passes and not self.use_hybrid_ocr
+        passes_completed = 3
         
         # Pass 2: Extract (Hybrid or Single)
-        if self.use_hybrid_ocr:
-            # HYBRID MODE: Run both engines in parallel
-            tesseract_text, surya_text, engines_used = await self.pass2_dual_extract(image, analysis)
+        if self.use_hybrid_ocr and self.adaptive_hybrid:
+            # ADAPTIVE HYBRID: analysis first, so a clear-cut page only pays
+            # for the engine it needs (Surya costs many times Tesseract)
+            analysis = await self.pass1_analyze_document(image)
+            sole = self._sole_engine(analysis)
+            tesseract_text = surya_text = None
+            if sole == 'tesseract':
+                log.info("🔤 Pass 2: Tesseract only (clean printed text)")
+                tesseract_text, engines_used = (await self.tesseract.process(image)).text, 'tesseract'
+            elif sole == 'surya':
+                log.info("🔤 Pass 2: Surya only (handwritten text)")
+                surya_text, engines_used = (await self.surya.process(image)).text, 'surya'
+            else:
+                tesseract_text, surya_text, engines_used = await self.pass2_dual_extract(image, analysis)
             
-            # Pass 3: Fusion
             final_text = await self.pass3_vision_guided_fusion(
-                image, tesseract_text, surya_text, analysis, engines_used
+                image, tesseract_text, surya_text, analysis, engines_used,
+                perfect_tables=perfect_tables
             )
             
             raw_text_length = len(tesseract_text or "") + len(surya_text or "")
+        elif self.use_hybrid_ocr:
+            # HYBRID MODE: Run both engines in parallel, and alongside Pass 1
+            # since neither engine waits on the analysis
+            analysis, (tesseract_text, surya_text, engines_used) = await asyncio.gather(
+                self.pass1_analyze_document(image),
+                self.pass2_dual_extract(image)
+            )
+            
+            # Pass 3: Fusion, unless the engines already agree
+            # (an edit-distance pass, so kept off the event loop)
+            if await asyncio.to_thread(self._engines_agree, tesseract_text, surya_text, analysis):
+                log.info("✨ Pass 3: Skipped - Tesseract and Surya agree")
+                final_text = await asyncio.to_thread(self.postprocessor.clean_text, tesseract_text)
+                passes_completed = 2
+            else:
+                final_text = await self.pass3_vision_guided_fusion(
+                    image, tesseract_text, surya_text, analysis, engines_used,
+                    perfect_tables=perfect_tables
+                )
+            
+            raw_text_length = len(tesseract_text or "") + len(surya_text or "")
+        elif fused:
+            # SINGLE ENGINE, FUSED: no analysis yet, so take the fast engine
+            # for printed text (Surya if Tesseract is missing), then one
+            # vision call both analyzes and corrects
+            raw_text, engines_used = await self.pass2_extract_text(
+                image, DocumentAnalysis({'document_type': 'print'})
+            )
+            analysis, final_text = await self.pass13_combined(image, raw_text, engines_used)
+            
+            raw_text_length = len(raw_text)
         else:
-            # SINGLE ENGINE MODE: Pick best engine
-            raw_text, engines_used = await self.pass2_extract_text(image, analysis)
+            # SINGLE ENGINE MODE: Pick best engine. Tesseract is the common
+            # pick, so start it while Pass 1 runs and drop it if Surya wins
+            tesseract_task = None
+            if self.tesseract.is_available():
+                tesseract_task = asyncio.create_task(self.tesseract.process(image))
+            try:
+                analysis = await self.pass1_analyze_document(image)
+            except BaseException:
+                if tesseract_task is not None:
+                    tesseract_task.cancel()
+                raise
+            raw_text, engines_used = await self.pass2_extract_text(image, analysis, tesseract_task)
             
             # Pass 3: Correction
             final_text = await self.pass3_vision_guided_correction(
@@ -520,9 +860,9 @@ Output ONLY the corrected, formatted markdown. No explanations or commentary."""
             
             raw_text_length = len(raw_text)
         
-        print("\n" + "="*70)
-        print("✅ PIPELINE COMPLETE")
-        print("="*70 + "\n")
+        log.info(BANNER_RULE)
+        log.info("✅ PIPELINE COMPLETE")
+        log.info(BANNER_RULE)
         
         # Create result
         result = OCRResult(
@@ -536,9 +876,33 @@ Output ONLY the corrected, formatted markdown. No explanations or commentary."""
                 'hybrid_mode': self.use_hybrid_ocr,
                 'raw_text_length': raw_text_length,
                 'final_text_length': len(final_text),
-                'passes_completed': 3
+                'passes_completed': passes_completed
             }
         )
         
         return result
-
+    
+    async def process_batch(
+        self,
+        images: List[Image.Image],
+        max_concurrent: Optional[int] = None,
+        perfect_tables: bool = None
+    ) -> List[OCRResult]:
+        """
+        Run every page of a multi-page document through the pipeline.
+        
+        Pages overlap, up to max_concurrent at once (None =
+        settings.pipeline_concurrency), so one page's vision calls wait on
+        the network while another's OCR runs. The engines keep their own
+        limits: Tesseract its worker pool, Surya its single batching
+        worker. Pixel-identical pages run once. Results keep page order.
+        """
+        limit = asyncio.Semaphore(max(1, max_concurrent or settings.pipeline_concurrency))
+        
+        async def one(image: Image.Image) -> OCRResult:
+            async with limit:
+                return await self.process(image, perfect_tables=perfect_tables)
+        
+        uniques, slots = unique_pages(images)
+        results = await asyncio.gather(*(one(image) for image in uniques))
+        return expand_duplicates(list(results), slots)
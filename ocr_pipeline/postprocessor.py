@@ -1,7 +1,24 @@
 """Post-processing for OCR results - cleaning and formatting."""
+import asyncio
 import re
-import httpx
 from config import settings
+from .http import ollama_generate
+from .response_cache import get_response_cache, text_key
+
+# Compiled once at import; these run for every line of every OCR result
+WS_RUN_RE = re.compile(r'[ \t]+')
+ELLIPSIS_RE = re.compile(r'(\. ?){3,}')
+PARA_BREAK_RE = re.compile(r'\n{2,}')
+LIST_MARKER_RE = re.compile(r'^[*-]\s+', re.MULTILINE)
+MULTI_NEWLINE_RE = re.compile(r'\n{3,}')
+# One pass for: collapse repeated punctuation, drop whitespace before it,
+# and squeeze other whitespace runs to a single space (see _punct_space_repl)
+PUNCT_SPACE_RE = re.compile(r'\s*([.,;:!?])\1*|\s+')
+SYMBOL_TRANS = str.maketrans({'·': '.', '•': '.', '×': 'x', '–': '-', '—': '-'})
+
+
+def _punct_space_repl(m: "re.Match") -> str:
+    return m.group(1) or ' '
 
 
 class OCRPostProcessor:
@@ -11,6 +28,7 @@ class OCRPostProcessor:
         self.text_provider = settings.text_provider
         self.text_model = settings.text_model
         self.ollama_host = settings.ollama_host
+        self._cache = get_response_cache(settings.vision_cache_path) if settings.text_cache_enabled else None
     
     async def format_as_markdown(self, text: str, use_llm: bool = True) -> str:
         """
@@ -29,21 +47,22 @@ class OCRPostProcessor:
         if use_llm:
             return await self._format_with_llm(text)
         else:
-            return self._format_with_regex(text)
+            # Regex passes over a whole document; keep them off the event loop
+            return await asyncio.to_thread(self._format_with_regex, text)
     
     def _format_with_regex(self, text: str) -> str:
         """Basic regex-based formatting."""
         # Normalize whitespace
-        text = re.sub(r'[ \t]+', ' ', text)
+        text = WS_RUN_RE.sub(' ', text)
         
         # Fix ellipsis
-        text = re.sub(r'(\. ?){3,}', '…', text)
+        text = ELLIPSIS_RE.sub('…', text)
         
         # Normalize newlines
-        text = re.sub(r'\n{2,}', '\n\n', text)
+        text = PARA_BREAK_RE.sub('\n\n', text)
         
         # Fix list markers
-        text = re.sub(r'^[*-]\s+', '- ', text, flags=re.MULTILINE)
+        text = LIST_MARKER_RE.sub('- ', text)
         
         return text.strip()
     
@@ -66,10 +85,16 @@ Raw OCR text:
 
 Output ONLY the formatted markdown, no commentary:"""
         
+        # Reprocessing a document feeds the formatter the same text again
+        key = text_key(prompt, self.text_model)
+        if self._cache is not None:
+            cached = await self._cache.get(key)
+            if cached is not None:
+                return cached
+        
         payload = {
             "model": self.text_model,
             "prompt": prompt,
-            "stream": False,
             "options": {
                 "temperature": 0.2,
                 "num_ctx": 4096
@@ -77,20 +102,20 @@ Output ONLY the formatted markdown, no commentary:"""
         }
         
         try:
-            async with httpx.AsyncClient(timeout=60.0) as client:
-                response = await client.post(
-                    f"{self.ollama_host}/api/generate",
-                    json=payload
-                )
-                response.raise_for_status()
-                data = response.json()
+            # Streamed: 60s is the limit between chunks, not for the whole
+            # reformat, so long pages no longer fall back to regex mid-reply
+            data = await ollama_generate(payload, timeout=60.0)
             
             formatted = data.get("response", "").strip()
-            return formatted if formatted else text
+            if not formatted:
+                return text
+            if self._cache is not None:
+                await self._cache.put(key, formatted)
+            return formatted
             
         except Exception as e:
             print(f"LLM formatting error: {e}, falling back to regex")
-            return self._format_with_regex(text)
+            return await asyncio.to_thread(self._format_with_regex, text)
     
     def clean_text(self, text: str, aggressive: bool = False) -> str:
         """
@@ -117,33 +142,24 @@ Output ONLY the formatted markdown, no commentary:"""
                 continue
             
             # Normalize symbols
-            line = (line.replace('·', '.')
-                       .replace('•', '.')
-                       .replace('×', 'x')
-                       .replace('–', '-')
-                       .replace('—', '-'))
+            line = line.translate(SYMBOL_TRANS)
             
             # Skip lines with too many special characters
             if aggressive:
-                alpha_count = sum(c.isalpha() for c in line)
+                alpha_count = sum(map(str.isalpha, line))
                 if alpha_count < 3 and len(line) > 1:
                     continue
             
-            # Fix multiple punctuation
-            line = re.sub(r'([.,;:!?])\1+', r'\1', line)
-            
-            # Fix spaces before punctuation
-            line = re.sub(r'\s+([.,;:!?])', r'\1', line)
-            
-            # Normalize spaces
-            line = re.sub(r'\s+', ' ', line)
+            # Fix repeated punctuation, spaces before punctuation and
+            # space runs in a single scan
+            line = PUNCT_SPACE_RE.sub(_punct_space_repl, line)
             
             if line:
                 cleaned_lines.append(line)
         
         # Join and normalize paragraph breaks
         text = '\n'.join(cleaned_lines)
-        text = re.sub(r'\n{3,}', '\n\n', text)
+        text = MULTI_NEWLINE_RE.sub('\n\n', text)
         
         return text.strip()
 
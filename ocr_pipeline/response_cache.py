@@ -0,0 +1,73 @@
+"""Persistent cache of model responses, keyed by image (or text), prompt and model."""
+import asyncio
+import hashlib
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Optional
+from PIL import Image
+from .imaging import content_key
+
+
+def response_key(image: Image.Image, prompt: str, model: str) -> bytes:
+    """Content hash of everything that determines a (temperature ~0) response."""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f"{model}\0".encode())
+    # Page hash is memoized, so a page's several prompts hash it only once
+    h.update(content_key(image))
+    h.update(prompt.encode())
+    return h.digest()
+
+
+def text_key(text: str, model: str) -> bytes:
+    """Content hash for text-only requests (no image involved)."""
+    h = hashlib.blake2b(digest_size=16, person=b"text")
+    h.update(f"{model}\0".encode())
+    h.update(text.encode())
+    return h.digest()
+
+
+class ResponseCache:
+    """
+    SQLite-backed key/value store for model responses.
+    
+    Lookups and writes run in a worker thread so the event loop never waits
+    on disk; one connection is shared under a lock.
+    """
+    
+    def __init__(self, path: str):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses (key BLOB PRIMARY KEY, response TEXT NOT NULL)"
+        )
+        self._db.commit()
+    
+    def _get(self, key: bytes) -> Optional[str]:
+        with self._lock:
+            row = self._db.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+    
+    def _put(self, key: bytes, response: str):
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?)", (key, response))
+            self._db.commit()
+    
+    async def get(self, key: bytes) -> Optional[str]:
+        return await asyncio.to_thread(self._get, key)
+    
+    async def put(self, key: bytes, response: str):
+        await asyncio.to_thread(self._put, key, response)
+
+
+_cache: Optional[ResponseCache] = None
+
+
+def get_response_cache(path: str) -> ResponseCache:
+    """Process-wide cache for the given database file (opened on first use)."""
+    global _cache
+    if _cache is None:
+        _cache = ResponseCache(path)
+    return _cache
@@ -1,5 +1,10 @@
 """Intelligent OCR engine router based on document type and confidence."""
-from typing import List, Optional
+import asyncio
+import random
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+import httpx
 from PIL import Image
 from .classifier import DocumentClassifier, DocumentType
 from .engines.base_engine import BaseOCREngine, OCRResult
@@ -8,6 +13,44 @@ from .engines.surya_engine import SuryaEngine
 from .engines.vision_local import VisionLocalEngine
 from config import settings
 
+ENGINE_RETRY_ATTEMPTS = 3  # Total tries per engine when it is throttled
+ENGINE_RETRY_BASE_DELAY = 1.0  # Seconds; doubled after each throttled try
+ENGINE_RETRY_MAX_DELAY = 20.0  # Ceiling on a single backoff sleep
+# Engines to try per document type, in order of preference. LOW_QUALITY is
+# absent: it tries everything available.
+ENGINE_PREFERENCES = {
+    # Tesseract is best for clean printed text
+    DocumentType.PRINTED_TEXT: ('tesseract', 'vision'),
+    # Surya and vision models for handwriting
+    DocumentType.HANDWRITING: ('surya', 'vision'),
+    # Use all available engines
+    DocumentType.MIXED: ('vision', 'surya', 'tesseract'),
+    # Vision models and Tesseract
+    DocumentType.SCREENSHOT: ('vision', 'tesseract'),
+    # Vision models are best for tables
+    DocumentType.TABLE_HEAVY: ('vision',),
+}
+
+
+def _is_transient(error: Exception) -> bool:
+    """True for rate limits and server-side hiccups worth retrying."""
+    if isinstance(error, httpx.HTTPStatusError):
+        status = error.response.status_code
+        return status == 429 or status >= 500
+    # SDK clients raise their own types; fall back to the message
+    message = str(error).lower()
+    return '429' in message or 'rate limit' in message or 'quota' in message
+
+
+def _parse_intervals(spec: str) -> Dict[str, float]:
+    """Parse "name=seconds,name=seconds" into a dict."""
+    intervals = {}
+    for item in spec.split(','):
+        name, sep, seconds = item.partition('=')
+        if sep and name.strip():
+            intervals[name.strip()] = float(seconds)
+    return intervals
+
 
 class OCRRouter:
     """Routes documents to the best OCR engine(s) based on classification."""
@@ -28,51 +71,67 @@ class OCRRouter:
             self.available_engines['surya'] = self.surya
         if self.vision.is_available():
             self.available_engines['vision'] = self.vision
+        
+        # Availability is fixed from here on, so resolve routing once
+        self._routing: Dict[DocumentType, Tuple[BaseOCREngine, ...]] = {
+            doc_type: tuple(
+                self.available_engines[name] for name in names
+                if name in self.available_engines
+            )
+            for doc_type, names in ENGINE_PREFERENCES.items()
+        }
+        # Try all engines, pick best
+        self._routing[DocumentType.LOW_QUALITY] = tuple(self.available_engines.values())
+        
+        # Per-engine pacing: the next monotonic time a call may start
+        self._min_interval = _parse_intervals(settings.engine_min_intervals)
+        self._next_slot: Dict[str, float] = {}
+        self._slot_lock = asyncio.Lock()
+    
+    async def _throttle(self, engine: BaseOCREngine):
+        """Wait until engine may be called again under its minimum interval."""
+        interval = self._min_interval.get(engine.name, 0.0)
+        if interval <= 0:
+            return
+        # Reserve a slot under the lock, then sleep outside it, so a burst
+        # of callers is spaced out instead of queueing on the lock
+        async with self._slot_lock:
+            now = time.monotonic()
+            start = max(now, self._next_slot.get(engine.name, now))
+            self._next_slot[engine.name] = start + interval
+        if start > now:
+            await asyncio.sleep(start - now)
     
-    def _select_engines(self, doc_type: DocumentType) -> List[BaseOCREngine]:
+    async def _process(self, engine: BaseOCREngine, image: Image.Image) -> OCRResult:
+        """engine.process() at the engine's pace, retried with jittered backoff when throttled."""
+        for attempt in range(ENGINE_RETRY_ATTEMPTS):
+            await self._throttle(engine)
+            try:
+                return await engine.process(image)
+            except Exception as e:
+                if attempt == ENGINE_RETRY_ATTEMPTS - 1 or not _is_transient(e):
+                    raise
+            delay = min(ENGINE_RETRY_MAX_DELAY, ENGINE_RETRY_BASE_DELAY * 2 ** attempt)
+            # Jitter keeps concurrent samples from retrying in lockstep
+            await asyncio.sleep(delay + random.random() * 0.1)
+    
+    def _select_engines(self, doc_type: DocumentType) -> Tuple[BaseOCREngine, ...]:
         """Select appropriate engines based on document type."""
-        engines = []
-        
-        if doc_type == DocumentType.PRINTED_TEXT:
-            # Tesseract is best for clean printed text
-            if 'tesseract' in self.available_engines:
-                engines.append(self.available_engines['tesseract'])
-            if 'vision' in self.available_engines:
-                engines.append(self.available_engines['vision'])
-        
-        elif doc_type == DocumentType.HANDWRITING:
-            # Surya and vision models for handwriting
-            if 'surya' in self.available_engines:
-                engines.append(self.available_engines['surya'])
-            if 'vision' in self.available_engines:
-                engines.append(self.available_engines['vision'])
-        
-        elif doc_type == DocumentType.MIXED:
-            # Use all available engines
-            if 'vision' in self.available_engines:
-                engines.append(self.available_engines['vision'])
-            if 'surya' in self.available_engines:
-                engines.append(self.available_engines['surya'])
-            if 'tesseract' in self.available_engines:
-                engines.append(self.available_engines['tesseract'])
-        
-        elif doc_type == DocumentType.SCREENSHOT:
-            # Vision models and Tesseract
-            if 'vision' in self.available_engines:
-                engines.append(self.available_engines['vision'])
-            if 'tesseract' in self.available_engines:
-                engines.append(self.available_engines['tesseract'])
-        
-        elif doc_type == DocumentType.TABLE_HEAVY:
-            # Vision models are best for tables
-            if 'vision' in self.available_engines:
-                engines.append(self.available_engines['vision'])
-        
-        elif doc_type == DocumentType.LOW_QUALITY:
-            # Try all engines, pick best
-            engines = list(self.available_engines.values())
-        
-        return engines
+        return self._routing.get(doc_type, ())
+    
+    async def _try_engines(self, engines: Tuple[BaseOCREngine, ...], image: Image.Image) -> List[OCRResult]:
+        """Run engines side by side; failures are reported and left out."""
+        outcomes = await asyncio.gather(
+            *(self._process(engine, image) for engine in engines),
+            return_exceptions=True
+        )
+        results = []
+        for engine, outcome in zip(engines, outcomes):
+            if isinstance(outcome, BaseException):
+                print(f"Error with {engine.name}: {outcome}")
+                continue
+            results.append(outcome)
+        return results
     
     async def route_and_process(
         self,
@@ -92,7 +151,7 @@ class OCRRouter:
         # If forcing specific engine
         if force_engine:
             if force_engine in self.available_engines:
-                return await self.available_engines[force_engine].process(image)
+                return await self._process(self.available_engines[force_engine], image)
             else:
                 raise ValueError(f"Engine '{force_engine}' not available")
         
@@ -106,14 +165,22 @@ class OCRRouter:
             raise RuntimeError("No OCR engines available")
         
         # Process with selected engines
-        results = []
-        for engine in engines[:2]:  # Limit to 2 engines to save resources
-            try:
-                result = await engine.process(image)
-                results.append(result)
-            except Exception as e:
-                print(f"Error with {engine.name}: {e}")
-                continue
+        engines = engines[:2]  # Limit to 2 engines to save resources
+        threshold = settings.router_short_circuit_threshold
+        short_circuited = False
+        if len(engines) > 1 and threshold <= 1.0 and engines[0].measured_confidence:
+            # Most pages are easy: give the preferred engine the first go and
+            # only pay for the second when it is unsure (or failed). Only for
+            # measured scores: the vision engine's fixed 0.9 for any longer
+            # reply would always clear the bar
+            results = await self._try_engines(engines[:1], image)
+            short_circuited = bool(results) and results[0].confidence >= threshold
+            if not short_circuited:
+                results += await self._try_engines(engines[1:], image)
+        else:
+            # They are independent, so run them side by side and wait for
+            # the slower one rather than their sum
+            results = await self._try_engines(engines, image)
         
         if not results:
             raise RuntimeError("All OCR engines failed")
@@ -122,6 +189,28 @@ class OCRRouter:
         best_result = max(results, key=lambda r: r.confidence)
         best_result.metadata["document_type"] = doc_type.value
         best_result.metadata["engines_tried"] = [r.engine_name for r in results]
+        best_result.metadata["short_circuited"] = short_circuited
         
         return best_result
 
+
+_router: Optional[OCRRouter] = None
+_router_lock = threading.Lock()
+
+
+def get_router() -> OCRRouter:
+    """
+    Process-wide router, built on first use.
+    
+    Building one loads every engine (Surya's models take seconds), so API
+    handlers and test orchestrators share this instance. The engines take
+    concurrent calls already (blocking work runs on worker threads); the
+    router's pacing lock belongs to the event loop that first waits on it.
+    """
+    global _router
+    if _router is None:
+        # Callers may arrive from worker threads; build exactly once
+        with _router_lock:
+            if _router is None:
+                _router = OCRRouter()
+    return _router
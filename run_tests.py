@@ -4,6 +4,7 @@ Usage: python run_tests.py [--dataset DATASET] [--engine ENGINE] [--max-samples
 """
 import asyncio
 import argparse
+from datetime import datetime
 from testing.orchestrator import TestOrchestrator
 
 
@@ -61,6 +62,7 @@ async def main():
         # Run benchmark
         dataset_names = [args.dataset] if args.dataset else None
         
+        started = datetime.now()
         results = await orchestrator.run_benchmark(
             dataset_names=dataset_names,
             force_engine=args.engine,
@@ -73,16 +75,12 @@ async def main():
         print("=" * 60)
         print(f"Total tests: {len(results)}")
         
-        # Calculate overall metrics
-        results_with_metrics = [r for r in results if r.metrics]
-        if results_with_metrics:
-            avg_accuracy = sum(r.metrics['accuracy'] for r in results_with_metrics) / len(results_with_metrics)
-            avg_cer = sum(r.metrics['character_error_rate'] for r in results_with_metrics) / len(results_with_metrics)
-            avg_time = sum(r.processing_time for r in results) / len(results)
-            
-            print(f"Average Accuracy: {avg_accuracy:.1%}")
-            print(f"Average CER: {avg_cer:.3f}")
-            print(f"Average Processing Time: {avg_time:.2f}s")
+        # Overall metrics for this run, aggregated by SQLite over the saved rows
+        stats = await orchestrator.get_summary_stats(dataset=args.dataset, since_timestamp=started)
+        if stats['total_tests'] > 0 and stats['avg_accuracy'] is not None:
+            print(f"Average Accuracy: {stats['avg_accuracy']:.1%}")
+            print(f"Average CER: {stats['avg_cer']:.3f}")
+            print(f"Average Processing Time: {stats['avg_processing_time']:.2f}s")
         
         print("=" * 60)
 
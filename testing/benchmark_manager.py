@@ -1,9 +1,12 @@
 """Manage test datasets and ground truth data."""
 import json
+import os
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 from PIL import Image
 
+IMG_EXTS = frozenset({'jpg', 'jpeg', 'png', 'gif', 'bmp'})
+
 
 class BenchmarkDataset:
     """Represents a single benchmark dataset."""
@@ -17,27 +20,57 @@ class BenchmarkDataset:
         # Create directories if they don't exist
         self.images_path.mkdir(parents=True, exist_ok=True)
         self.ground_truth_path.mkdir(parents=True, exist_ok=True)
+        
+        # Directory mtimes the cached samples were listed at
+        self._samples_key: Optional[Tuple[int, int]] = None
+        self._samples: List[Dict] = []
+        self._with_gt = 0
     
     def get_samples(self) -> List[Dict]:
         """Get all samples in this dataset."""
-        samples = []
+        self._refresh()
+        return [dict(s) for s in self._samples]
+    
+    def get_counts(self) -> Tuple[int, int]:
+        """(samples, samples with ground truth), without building sample copies."""
+        self._refresh()
+        return len(self._samples), self._with_gt
+    
+    def _refresh(self):
+        # A directory's mtime moves whenever an entry is added, removed or
+        # renamed, so an unchanged pair means the listing is still valid
+        key = (os.stat(self.images_path).st_mtime_ns, os.stat(self.ground_truth_path).st_mtime_ns)
+        if key != self._samples_key:
+            self._samples, self._with_gt = self._scan()
+            self._samples_key = key
+    
+    def _scan(self) -> Tuple[List[Dict], int]:
+        # One directory read each; scandir entries carry the file type, so
+        # there is no stat or exists() call per image
+        with os.scandir(self.ground_truth_path) as it:
+            gt_stems = {e.name[:-4] for e in it if e.name.endswith('.txt')}
         
-        for img_file in self.images_path.glob("*.*"):
-            if img_file.suffix.lower() not in ['.jpg', '.jpeg', '.png', '.gif', '.bmp']:
-                continue
-            
-            # Look for corresponding ground truth
-            gt_file = self.ground_truth_path / f"{img_file.stem}.txt"
-            
-            sample = {
-                "id": img_file.stem,
-                "image_path": str(img_file),
-                "ground_truth_path": str(gt_file) if gt_file.exists() else None,
-                "dataset": self.name
-            }
-            samples.append(sample)
+        samples = []
+        with_gt = 0
+        with os.scandir(self.images_path) as it:
+            for entry in it:
+                stem, dot, ext = entry.name.rpartition('.')
+                if not dot or not stem or ext.lower() not in IMG_EXTS or not entry.is_file():
+                    continue
+                
+                # Look for corresponding ground truth
+                has_gt = stem in gt_stems
+                with_gt += has_gt
+                
+                sample = {
+                    "id": stem,
+                    "image_path": entry.path,
+                    "ground_truth_path": str(self.ground_truth_path / f"{stem}.txt") if has_gt else None,
+                    "dataset": self.name
+                }
+                samples.append(sample)
         
-        return samples
+        return samples, with_gt
     
     def add_sample(self, image: Image.Image, ground_truth: str, sample_id: str) -> None:
         """Add a new sample to the dataset."""
@@ -115,12 +148,12 @@ class BenchmarkManager:
         stats = {}
         
         for name, dataset in self.datasets.items():
-            samples = dataset.get_samples()
-            with_gt = sum(1 for s in samples if s['ground_truth_path'])
+            # Counted during the same directory scan that lists the samples
+            total, with_gt = dataset.get_counts()
             stats[name] = {
-                "total_samples": len(samples),
+                "total_samples": total,
                 "with_ground_truth": with_gt,
-                "without_ground_truth": len(samples) - with_gt
+                "without_ground_truth": total - with_gt
             }
         
         return stats
@@ -1,14 +1,102 @@
 """Test orchestration and execution."""
 import asyncio
+import mmap
+import os
+import threading
+from collections import OrderedDict
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 from pathlib import Path
 from PIL import Image
 import aiosqlite
 
 from .benchmark_manager import BenchmarkManager
 from .metrics import OCRMetrics
-from ocr_pipeline.router import OCRRouter
+from ocr_pipeline.router import get_router
+from config import settings
+
+SAVE_BATCH_SIZE = 64  # Results buffered per executemany/commit during a benchmark
+
+INSERT_RESULT_SQL = """
+    INSERT INTO test_results 
+    (sample_id, dataset, engine, predicted_text, ground_truth, 
+     cer, wer, accuracy, processing_time, timestamp)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+# Fixed text, so SQLite's statement cache can reuse the prepared plan; the
+# day window is bound as a datetime() modifier like '-30 days'
+BASE_STATS_SQL = """
+    SELECT 
+        COUNT(*) as total_tests,
+        AVG(cer) as avg_cer,
+        AVG(wer) as avg_wer,
+        AVG(accuracy) as avg_accuracy,
+        AVG(processing_time) as avg_time,
+        MIN(accuracy) as min_accuracy,
+        MAX(accuracy) as max_accuracy
+    FROM test_results
+    WHERE timestamp > datetime('now', ?)
+"""
+
+
+MMAP_GT_MIN_BYTES = 64 * 1024  # Ground-truth files at least this big are decoded straight from a mapping
+IMAGE_CACHE_BYTES = 512 * 1024 * 1024  # Decoded sample images kept across benchmark runs
+
+# (path, mtime_ns, size) -> decoded image, least recently used first; a
+# rewritten file gets a new key, and its stale entry ages out
+_image_cache: "OrderedDict[Tuple[str, int, int], Image.Image]" = OrderedDict()
+_image_cache_bytes = 0
+_image_cache_lock = threading.Lock()  # Samples load on worker threads
+
+
+def _load_image(path: str) -> Image.Image:
+    """Decode an image, reusing the result of an earlier decode of the same file."""
+    global _image_cache_bytes
+    st = os.stat(path)
+    key = (path, st.st_mtime_ns, st.st_size)
+    with _image_cache_lock:
+        image = _image_cache.get(key)
+        if image is not None:
+            _image_cache.move_to_end(key)
+            return image
+    
+    image = Image.open(path)
+    image.load()
+    nbytes = image.width * image.height * len(image.getbands())
+    if nbytes > IMAGE_CACHE_BYTES:
+        return image
+    with _image_cache_lock:
+        if key not in _image_cache:
+            _image_cache[key] = image
+            _image_cache_bytes += nbytes
+        while _image_cache_bytes > IMAGE_CACHE_BYTES:
+            _, old = _image_cache.popitem(last=False)
+            _image_cache_bytes -= old.width * old.height * len(old.getbands())
+    return image
+
+
+def _read_ground_truth(path: str) -> str:
+    """Read a ground-truth file as text, with newlines normalised like read_text()."""
+    if os.path.getsize(path) < MMAP_GT_MIN_BYTES:
+        return Path(path).read_text(encoding='utf-8')
+    # Decoding the mapped pages directly skips the intermediate bytes copy
+    # that a buffered read makes of a multi-MB transcript
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        with memoryview(mm) as view:
+            text = str(view, 'utf-8')
+    if '\r' in text:
+        text = text.replace('\r\n', '\n').replace('\r', '\n')
+    return text
+
+
+def _load_sample(sample: Dict) -> Tuple[Image.Image, Optional[str]]:
+    """Decode a sample's image and read its ground truth (blocking file I/O)."""
+    image = _load_image(sample['image_path'])
+    ground_truth = None
+    if sample['ground_truth_path']:
+        ground_truth = _read_ground_truth(sample['ground_truth_path'])
+    return image, ground_truth
 
 
 class TestResult:
@@ -41,12 +129,15 @@ class TestOrchestrator:
     def __init__(self, db_path: str = "data/test_results.db"):
         self.db_path = db_path
         self.benchmark_manager = BenchmarkManager()
-        self.ocr_router = OCRRouter()
+        self.ocr_router = get_router()
         self.metrics_calculator = OCRMetrics()
     
     async def initialize_database(self):
         """Initialize the results database."""
         async with aiosqlite.connect(self.db_path) as db:
+            # WAL persists in the file; NORMAL is only safe (and only
+            # needed) per connection, see _connect
+            await db.execute("PRAGMA journal_mode=WAL")
             await db.execute("""
                 CREATE TABLE IF NOT EXISTS test_results (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -70,8 +161,19 @@ class TestOrchestrator:
                 CREATE INDEX IF NOT EXISTS idx_engine_timestamp 
                 ON test_results(engine, timestamp)
             """)
+            # Holds every column get_summary_stats reads, so it runs index-only
+            await db.execute("""
+                CREATE INDEX IF NOT EXISTS idx_stats 
+                ON test_results(timestamp, dataset, engine, accuracy, cer, wer, processing_time)
+            """)
             await db.commit()
     
+    async def _connect(self) -> aiosqlite.Connection:
+        """Open a results connection; under WAL, NORMAL skips the fsync per commit."""
+        db = await aiosqlite.connect(self.db_path)
+        await db.execute("PRAGMA synchronous=NORMAL")
+        return db
+    
     async def run_test_on_sample(
         self,
         sample: Dict,
@@ -80,13 +182,9 @@ class TestOrchestrator:
         """Run OCR test on a single sample."""
         import time
         
-        # Load image
-        image = Image.open(sample['image_path'])
-        
-        # Load ground truth if available
-        ground_truth = None
-        if sample['ground_truth_path']:
-            ground_truth = Path(sample['ground_truth_path']).read_text(encoding='utf-8')
+        # Load image and ground truth (if available) off the event loop,
+        # which other samples are sharing
+        image, ground_truth = await asyncio.to_thread(_load_sample, sample)
         
         # Run OCR
         start_time = time.time()
@@ -109,27 +207,42 @@ class TestOrchestrator:
             timestamp=datetime.now()
         )
     
+    @staticmethod
+    def _result_row(result: TestResult) -> Tuple:
+        return (
+            result.sample_id,
+            result.dataset,
+            result.engine,
+            result.predicted_text,
+            result.ground_truth,
+            result.metrics.get('character_error_rate'),
+            result.metrics.get('word_error_rate'),
+            result.metrics.get('accuracy'),
+            result.processing_time,
+            result.timestamp
+        )
+    
+    async def save_results_batch(
+        self,
+        results: List[TestResult],
+        db: Optional[aiosqlite.Connection] = None
+    ):
+        """Save test results in one transaction (on db if given, else a new connection)."""
+        if not results:
+            return
+        if db is None:
+            db = await self._connect()
+            try:
+                await self.save_results_batch(results, db)
+            finally:
+                await db.close()
+            return
+        await db.executemany(INSERT_RESULT_SQL, [self._result_row(r) for r in results])
+        await db.commit()
+    
     async def save_result(self, result: TestResult):
         """Save test result to database."""
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute("""
-                INSERT INTO test_results 
-                (sample_id, dataset, engine, predicted_text, ground_truth, 
-                 cer, wer, accuracy, processing_time, timestamp)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                result.sample_id,
-                result.dataset,
-                result.engine,
-                result.predicted_text,
-                result.ground_truth,
-                result.metrics.get('character_error_rate'),
-                result.metrics.get('word_error_rate'),
-                result.metrics.get('accuracy'),
-                result.processing_time,
-                result.timestamp
-            ))
-            await db.commit()
+        await self.save_results_batch([result])
     
     async def run_benchmark(
         self,
@@ -163,31 +276,61 @@ class TestOrchestrator:
         
         print(f"Running benchmark on {len(samples)} samples...")
         
-        # Run tests
-        results = []
-        for i, sample in enumerate(samples, 1):
+        # Run tests; samples are independent, so several run at once
+        # (processing_time then includes contention from the others)
+        semaphore = asyncio.Semaphore(settings.benchmark_concurrency or os.cpu_count() or 1)
+        done = 0
+        pending: List[TestResult] = []
+        
+        async def flush():
+            # Swap the buffer out first so samples finishing meanwhile
+            # start the next batch instead of being lost
+            batch = pending[:]
+            pending.clear()
             try:
-                print(f"Testing {i}/{len(samples)}: {sample['id']} ({sample['dataset']})")
-                result = await self.run_test_on_sample(sample, force_engine)
-                await self.save_result(result)
-                results.append(result)
-                
-                # Print metrics if available
-                if result.metrics:
-                    print(f"  CER: {result.metrics['character_error_rate']:.3f}, "
-                          f"Accuracy: {result.metrics['accuracy']:.3f}")
-                
+                await self.save_results_batch(batch, db)
             except Exception as e:
-                print(f"  Error: {e}")
-                continue
+                print(f"  Error saving {len(batch)} results: {e}")
+        
+        async def run_one(sample: Dict) -> Optional[TestResult]:
+            nonlocal done
+            async with semaphore:
+                try:
+                    result = await self.run_test_on_sample(sample, force_engine)
+                except Exception as e:
+                    done += 1
+                    print(f"Failed {done}/{len(samples)}: {sample['id']} ({sample['dataset']}): {e}")
+                    return None
+            
+            pending.append(result)
+            if len(pending) >= SAVE_BATCH_SIZE:
+                await flush()
+            
+            done += 1
+            print(f"Tested {done}/{len(samples)}: {sample['id']} ({sample['dataset']})")
+            # Print metrics if available
+            if result.metrics:
+                print(f"  CER: {result.metrics['character_error_rate']:.3f}, "
+                      f"Accuracy: {result.metrics['accuracy']:.3f}")
+            return result
         
-        return results
+        # One connection for the whole run; rows are written in batches
+        db = await self._connect()
+        try:
+            outcomes = await asyncio.gather(*(run_one(s) for s in samples))
+            await flush()
+        finally:
+            await db.close()
+        
+        # gather keeps input order, so results still follow the sample list
+        return [r for r in outcomes if r is not None]
     
     async def get_summary_stats(
         self,
         dataset: Optional[str] = None,
         engine: Optional[str] = None,
-        limit_days: int = 30
+        limit_days: int = 30,
+        since_timestamp: Optional[datetime] = None
     ) -> Dict:
         """
         Get summary statistics from test results.
@@ -196,25 +339,16 @@ class TestOrchestrator:
             dataset: Filter by dataset (all if None)
             engine: Filter by engine (all if None)
             limit_days: Only include results from last N days
+            since_timestamp: Only include results saved at or after this time
+                (e.g. the start of a run_benchmark call)
             
         Returns:
             Dictionary with summary statistics
         """
-        query = """
-            SELECT 
-                COUNT(*) as total_tests,
-                AVG(cer) as avg_cer,
-                AVG(wer) as avg_wer,
-                AVG(accuracy) as avg_accuracy,
-                AVG(processing_time) as avg_time,
-                MIN(accuracy) as min_accuracy,
-                MAX(accuracy) as max_accuracy
-            FROM test_results
-            WHERE timestamp > datetime('now', '-{} days')
-        """.format(limit_days)
+        query = BASE_STATS_SQL
         
         conditions = []
-        params = []
+        params = [f"-{int(limit_days)} days"]
         
         if dataset:
             conditions.append("dataset = ?")
@@ -224,6 +358,11 @@ class TestOrchestrator:
             conditions.append("engine = ?")
             params.append(engine)
         
+        if since_timestamp:
+            # Bound like the saved timestamps, so both compare as the same text form
+            conditions.append("timestamp >= ?")
+            params.append(since_timestamp)
+        
         if conditions:
             query += " AND " + " AND ".join(conditions)
         
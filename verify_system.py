@@ -2,6 +2,7 @@
 Quick verification that the system is working after cleanup.
 """
 import sys
+from concurrent.futures import ThreadPoolExecutor
 
 
 def verify_imports():
@@ -44,13 +45,19 @@ def verify_providers():
         
         providers = ["ollama", "gemini", "openai", "anthropic", "openrouter"]
         
-        for provider in providers:
+        def check(provider: str) -> str:
             try:
                 p = get_vision_provider(provider)
                 status = "✅ Available" if p.is_available() else "⚠️  Not configured"
-                print(f"  {status}: {provider} ({p.model_name})")
+                return f"  {status}: {provider} ({p.model_name})"
             except Exception as e:
-                print(f"  ❌ {provider}: {e}")
+                return f"  ❌ {provider}: {e}"
+        
+        # Checks may each wait on the network (Ollama ping, SDK setup), so
+        # run them together; map() keeps the report in provider order
+        with ThreadPoolExecutor(max_workers=len(providers)) as pool:
+            for line in pool.map(check, providers):
+                print(line)
         
         return True
     except Exception as e:
@@ -90,10 +97,17 @@ def verify_engines():
         from ocr_pipeline.engines.tesseract_engine import TesseractEngine
         from ocr_pipeline.engines.surya_engine import SuryaEngine
         
-        tesseract = TesseractEngine()
-        surya = SuryaEngine()
+        def check_tesseract():
+            tesseract = TesseractEngine()
+            return tesseract, tesseract.is_available()  # Shells out to the binary
+        
+        # Surya's setup and Tesseract's probe are independent; overlap them
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            tesseract_check = pool.submit(check_tesseract)
+            surya = pool.submit(SuryaEngine).result()
+            tesseract, tesseract_ok = tesseract_check.result()
         
-        print(f"  {'✅' if tesseract.is_available() else '⚠️ '} Tesseract: {tesseract.name}")
+        print(f"  {'✅' if tesseract_ok else '⚠️ '} Tesseract: {tesseract.name}")
         print(f"  ✅ Surya: {surya.name}")
         
         return True